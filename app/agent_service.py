@@ -1,7 +1,10 @@
 import time
 import asyncio
+import functools
 import os
+import random
 from typing import Dict, Any, Optional
+import httpx
 import openai
 import tiktoken
 import structlog
@@ -9,14 +12,71 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import AgentRequest, AgentResponse, InteractionStatus, FailureMode, FailureType
 from .failure_injector import FailureInjector
-from .redis_client import StateManager
-from .database import AgentInteraction, get_db_session
+from .redis_client import StateManager, COUNTER_FIELDS
+from .database import interaction_writer
 from .metrics import metrics_collector, track_agent_performance
 from .validation import create_standard_validator, create_behavioral_aware_validator, ValidationLevel
 from .behavioral.monitoring_service import BehavioralMonitoringService
 
 logger = structlog.get_logger(__name__)
 
+# Conversation messages sent to the LLM per request (last 3 exchanges)
+RECENT_HISTORY_MESSAGES = 6
+
+# Failure types that abort the request regardless of what the LLM would have said
+SKIP_NATURAL_RESPONSE_TYPES = frozenset({FailureType.INTEGRATION, FailureType.RESOURCE})
+
+# Shared across requests; never mutated
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are a helpful customer service agent. You assist users with their questions and problems in a friendly, professional manner. 
+                    Keep your responses concise but helpful. If you don't know something, admit it and offer to escalate or find more information."""
+}
+
+# Observed status and fallback text for each injected failure type
+INJECTED_STATUS_BY_TYPE = {
+    FailureType.OUTPUT_QUALITY: InteractionStatus.FAILURE,
+    FailureType.BEHAVIORAL: InteractionStatus.FAILURE,
+    FailureType.INTEGRATION: InteractionStatus.ERROR,
+    FailureType.RESOURCE: InteractionStatus.ERROR,
+}
+INJECTED_FALLBACK_RESPONSES = {
+    FailureType.INTEGRATION: "Integration failure occurred",
+    FailureType.RESOURCE: "Resource limit exceeded",
+}
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client shared by all LLM clients."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=1024, max_keepalive_connections=256),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("LLM HTTP client closed")
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(encoding_name: str) -> tiktoken.Encoding:
+    """Return a process-wide tiktoken encoding, falling back to cl100k_base."""
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except ValueError:
+        logger.warning(f"Unknown encoding '{encoding_name}', falling back to cl100k_base")
+        return tiktoken.get_encoding("cl100k_base")
+
 
 class CustomerServiceAgent:
     def __init__(self):
@@ -34,6 +94,9 @@ class CustomerServiceAgent:
         )
         self.state_manager = StateManager()
 
+        # Fraction of requests that also snapshot state before processing (failures always do)
+        self.checkpoint_sample_rate = float(os.getenv("CHECKPOINT_SAMPLE_RATE", "0"))
+
         # Configure AI client with environment variables
         api_key = os.getenv("AI_API_KEY")
         base_url = os.getenv("AI_BASE_URL", "https://api.openai.com/v1")  # Default to OpenAI
@@ -46,16 +109,13 @@ class CustomerServiceAgent:
         
         self.openai_client = openai.AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            http_client=get_http_client()
         )
         
         # Configure token encoding based on environment variable
         encoding_name = os.getenv("AI_ENCODING", "cl100k_base")  # Default to modern encoding
-        try:
-            self.encoding = tiktoken.get_encoding(encoding_name)
-        except ValueError:
-            logger.warning(f"Unknown encoding '{encoding_name}', falling back to cl100k_base")
-            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = _get_encoding(encoding_name)
 
         # Initialize behavioral monitoring service
         behavioral_tracking_enabled = os.getenv("BEHAVIORAL_TRACKING_ENABLED", "true").lower() == "true"
@@ -99,47 +159,71 @@ class CustomerServiceAgent:
 
     @track_agent_performance(failure_type="chat_completion")
     async def process_request(self, request: AgentRequest, db_session: AsyncSession) -> AgentResponse:
-        start_time = time.time()
+        start_time = time.monotonic_ns()
         
         try:
-            # Load agent state from Redis
-            agent_state = await self.state_manager.load_state(request.session_id)
+            # Failure injection is decided synchronously; no task is needed alongside the load
+            should_fail, failure_mode = self.failure_injector.should_inject_failure(
+                request.session_id,
+                request.message,
+                request.failure_mode
+            )
+
+            # Load agent state from Redis (only the history window the LLM sees)
+            agent_state = await self.state_manager.load_state(
+                request.session_id, history_limit=RECENT_HISTORY_MESSAGES
+            )
             if not agent_state:
                 agent_state = {
-                    "conversation_history": [],
+                    "messages": [],
+                    "history_meta": [],
                     "context": request.context or {},
                     "failure_count": 0,
-                    "recovery_count": 0
+                    "recovery_count": 0,
+                    "token_count_total": 0
                 }
+            # Counters are persisted as deltas, so concurrent requests don't overwrite them
+            counters_at_load = {field: agent_state.get(field, 0) for field in COUNTER_FIELDS}
             
-            # Create checkpoint before processing
-            await self.state_manager.create_checkpoint(
-                request.session_id, 
-                "pre_request", 
-                agent_state
-            )
-            
-            # Add current message to conversation history
-            agent_state["conversation_history"].append({
-                "role": "user",
-                "content": request.message,
-                "timestamp": time.time()
-            })
+            # Sampled checkpoint for debugging; failure paths checkpoint on their own
+            if self.checkpoint_sample_rate and random.random() < self.checkpoint_sample_rate:
+                await self.state_manager.create_checkpoint(
+                    request.session_id,
+                    "pre_request",
+                    agent_state
+                )
             
-            # Check if we should inject a failure
-            should_fail, failure_mode = await self.failure_injector.should_inject_failure(
-                request.session_id, 
-                request.message, 
-                request.failure_mode
-            )
+            # Add current message to conversation history; only the new message is tokenized
+            user_tokens = len(self.encoding.encode_ordinary(request.message))
+            user_message = {"role": "user", "content": request.message}
+            user_meta = {"timestamp": time.time_ns(), "token_count": user_tokens}
+            agent_state["messages"].append(user_message)
+            agent_state["history_meta"].append(user_meta)
+            agent_state["token_count_total"] += user_tokens
             
-            # Count tokens in conversation
-            token_count = self._count_tokens(agent_state["conversation_history"])
+            # Token count for the conversation so far, maintained incrementally
+            token_count = agent_state["token_count_total"]
             
-            # Always generate the natural response first
-            natural_response = await self._generate_normal_response(
-                request, agent_state, token_count, db_session
-            )
+            # Generate the natural response first, unless an integration/resource failure
+            # is about to replace it anyway - then skip the LLM round trip entirely
+            if should_fail and failure_mode and (
+                self.failure_injector.type_by_mode[failure_mode] in SKIP_NATURAL_RESPONSE_TYPES
+            ):
+                natural_response = AgentResponse(
+                    session_id=request.session_id,
+                    response="",
+                    status=InteractionStatus.ERROR,
+                    natural_status=InteractionStatus.NOT_CALLED,
+                    failure_injection_applied=False,
+                    natural_response=None,
+                    processing_time_ms=0,
+                    token_count=token_count,
+                    model_used=request.model
+                )
+            else:
+                natural_response = await self._generate_normal_response(
+                    request, agent_state, token_count, db_session
+                )
             
             # Apply failure injection if needed
             if should_fail and failure_mode:
@@ -149,7 +233,7 @@ class CustomerServiceAgent:
             else:
                 response = natural_response
             
-            processing_time = int((time.time() - start_time) * 1000)
+            processing_time = (time.monotonic_ns() - start_time) // 1_000_000
             response.processing_time_ms = processing_time
 
             # Process behavioral monitoring if enabled
@@ -186,21 +270,35 @@ class CustomerServiceAgent:
                                error=str(e))
 
             # Update agent state
-            agent_state["conversation_history"].append({
-                "role": "assistant",
-                "content": response.response,
-                "timestamp": time.time(),
-                "failure_mode": failure_mode.value if failure_mode else None
-            })
-            
-            # Save updated state
-            await self.state_manager.save_state(request.session_id, agent_state)
+            assistant_tokens = len(self.encoding.encode_ordinary(response.response))
+            assistant_message = {"role": "assistant", "content": response.response}
+            assistant_meta = {
+                "timestamp": time.time_ns(),
+                "failure_mode": failure_mode.value if failure_mode else None,
+                "token_count": assistant_tokens
+            }
+            agent_state["messages"].append(assistant_message)
+            agent_state["history_meta"].append(assistant_meta)
+            agent_state["token_count_total"] += assistant_tokens
+
+            # Persist only this turn's messages, off the response path
+            self.state_manager.schedule_append(
+                request.session_id, agent_state, {
+                    "messages": [user_message, assistant_message],
+                    "history_meta": [user_meta, assistant_meta]
+                },
+                increments={
+                    field: delta for field in COUNTER_FIELDS
+                    if (delta := agent_state.get(field, 0) - counters_at_load[field])
+                }
+            )
             
-            # Log interaction to database
-            interaction = AgentInteraction(
+            # Log interaction to database (batched by the background writer; the JSON
+            # columns serialize the Pydantic models directly)
+            interaction_writer.enqueue(dict(
                 session_id=request.session_id,
-                request_data=request.model_dump(),
-                response_data=response.model_dump(),
+                request_data=request,
+                response_data=response,
                 status=response.status.value,
                 natural_status=response.natural_status.value,
                 failure_mode=failure_mode.value if failure_mode else None,
@@ -209,15 +307,16 @@ class CustomerServiceAgent:
                 processing_time_ms=processing_time,
                 token_count=token_count,
                 model_used=request.model
-            )
-            
-            db_session.add(interaction)
-            await db_session.commit()
-            
+            ))
+
+            # Commit the baseline upserts behavioral monitoring merged into the request session
+            if self.behavioral_monitoring:
+                await db_session.commit()
+
             return response
             
         except Exception as e:
-            processing_time = int((time.time() - start_time) * 1000)
+            processing_time = (time.monotonic_ns() - start_time) // 1_000_000
             logger.error("Unexpected error in agent processing", 
                         session_id=request.session_id, 
                         error=str(e))
@@ -235,19 +334,17 @@ class CustomerServiceAgent:
             )
             
             # Log error interaction
-            interaction = AgentInteraction(
+            interaction_writer.enqueue(dict(
                 session_id=request.session_id,
-                request_data=request.model_dump(),
-                response_data=error_response.model_dump(),
+                request_data=request,
+                response_data=error_response,
                 status=InteractionStatus.ERROR.value,
+                natural_status=InteractionStatus.ERROR.value,
                 processing_time_ms=processing_time,
                 token_count=0,
                 model_used=request.model
-            )
-            
-            db_session.add(interaction)
-            await db_session.commit()
-            
+            ))
+
             return error_response
     
     async def _generate_normal_response(
@@ -258,22 +355,10 @@ class CustomerServiceAgent:
         db_session: AsyncSession
     ) -> AgentResponse:
         try:
-            # Prepare messages for OpenAI
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a helpful customer service agent. You assist users with their questions and problems in a friendly, professional manner. 
-                    Keep your responses concise but helpful. If you don't know something, admit it and offer to escalate or find more information."""
-                }
-            ]
-            
-            # Add conversation history (limit to recent messages to manage token count)
-            recent_history = agent_state["conversation_history"][-6:]  # Last 3 exchanges
-            for msg in recent_history:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            # Prepare messages for OpenAI: system prompt plus recent conversation history
+            # (limited to recent messages to manage token count); history entries are
+            # already in OpenAI message shape
+            messages = [SYSTEM_MESSAGE, *agent_state["messages"][-RECENT_HISTORY_MESSAGES:]]
             
             # Make OpenAI API call
             logger.info("Making LLM API call", 
@@ -315,7 +400,7 @@ class CustomerServiceAgent:
                     validation_context = {
                         "session_id": request.session_id,
                         "user_message": request.message,
-                        "conversation_history": agent_state["conversation_history"],
+                        "conversation_history": agent_state["messages"],
                         "model": request.model,
                         "response_start_time": start_time,
                         "request": request,
@@ -395,6 +480,7 @@ class CustomerServiceAgent:
         token_count: int,
         db_session: AsyncSession
     ) -> AgentResponse:
+        await self.state_manager.create_checkpoint(request.session_id, "pre_failure", agent_state)
         agent_state["failure_count"] += 1
         await self.state_manager.track_failure_count(request.session_id)
 
@@ -402,68 +488,37 @@ class CustomerServiceAgent:
         metrics_collector.record_failure_injection(failure_mode.value, "injected")
 
         try:
-            failure_type = self.failure_injector.failure_scenarios[failure_mode]["type"]
-            
-            if failure_type == FailureType.OUTPUT_QUALITY:
-                failed_response_text = await self.failure_injector.inject_output_quality_failure(
-                    request.session_id, failure_mode, natural_response.response
-                )
-                status = InteractionStatus.FAILURE
-                
-            elif failure_type == FailureType.BEHAVIORAL:
-                failed_response_text = await self.failure_injector.inject_behavioral_failure(
-                    request.session_id, failure_mode, request.message
-                )
-                status = InteractionStatus.FAILURE
-                
-            elif failure_type == FailureType.INTEGRATION:
-                await self.failure_injector.inject_integration_failure(
-                    request.session_id, failure_mode
-                )
-                # This should raise an exception, but in case it doesn't:
-                failed_response_text = "Integration failure occurred"
-                status = InteractionStatus.ERROR
-                
-            elif failure_type == FailureType.RESOURCE:
-                await self.failure_injector.inject_resource_failure(
-                    request.session_id, failure_mode, token_count
-                )
-                # This should raise an exception, but in case it doesn't:
-                failed_response_text = "Resource limit exceeded"
-                status = InteractionStatus.ERROR
-            
-            else:
-                failed_response_text = "An unknown failure occurred"
-                status = InteractionStatus.FAILURE
-            
-            # Create response with both natural and observed data
-            return AgentResponse(
-                session_id=request.session_id,
-                response=failed_response_text,  # What user sees
-                status=status,                   # Observed status
-                natural_status=natural_response.status,  # What LLM actually produced
-                failure_mode=failure_mode,
-                failure_injection_applied=True,
-                natural_response=natural_response.response,  # Original LLM response
-                processing_time_ms=0,  # Will be set by caller
-                token_count=token_count,
-                model_used=request.model
+            failure_type = self.failure_injector.type_by_mode[failure_mode]
+            handler = self.failure_injector.injector_by_type[failure_type]
+            failed_response_text = await handler(
+                request.session_id, failure_mode, request.message, natural_response.response, token_count
             )
+            if failed_response_text is None:
+                # Integration/resource injectors should raise, but in case they don't:
+                failed_response_text = INJECTED_FALLBACK_RESPONSES[failure_type]
+            status = INJECTED_STATUS_BY_TYPE[failure_type]
+
+            # Observed data layered over the natural response (natural_status and
+            # natural_response carry over); model_copy skips re-validating unchanged fields
+            return natural_response.model_copy(update={
+                "response": failed_response_text,  # What user sees
+                "status": status,                   # Observed status
+                "failure_mode": failure_mode,
+                "failure_injection_applied": True,
+                "processing_time_ms": 0,  # Will be set by caller
+                "token_count": token_count
+            })
             
         except Exception as e:
             # Handle integration and resource failures that throw exceptions
-            return AgentResponse(
-                session_id=request.session_id,
-                response=f"Service error: {str(e)}",
-                status=InteractionStatus.ERROR,
-                natural_status=natural_response.status,
-                failure_mode=failure_mode,
-                failure_injection_applied=True,
-                natural_response=natural_response.response,
-                processing_time_ms=0,
-                token_count=token_count,
-                model_used=request.model
-            )
+            return natural_response.model_copy(update={
+                "response": f"Service error: {str(e)}",
+                "status": InteractionStatus.ERROR,
+                "failure_mode": failure_mode,
+                "failure_injection_applied": True,
+                "processing_time_ms": 0,
+                "token_count": token_count
+            })
     
     async def _handle_failure(
         self, 
@@ -473,44 +528,21 @@ class CustomerServiceAgent:
         token_count: int,
         db_session: AsyncSession
     ) -> AgentResponse:
+        await self.state_manager.create_checkpoint(request.session_id, "pre_failure", agent_state)
         agent_state["failure_count"] += 1
         await self.state_manager.track_failure_count(request.session_id)
         
         try:
-            failure_type = self.failure_injector.failure_scenarios[failure_mode]["type"]
-            
-            if failure_type == FailureType.OUTPUT_QUALITY:
-                failed_response = await self.failure_injector.inject_output_quality_failure(
-                    request.session_id, failure_mode, "Normal response would go here"
-                )
-                status = InteractionStatus.FAILURE
-                
-            elif failure_type == FailureType.BEHAVIORAL:
-                failed_response = await self.failure_injector.inject_behavioral_failure(
-                    request.session_id, failure_mode, request.message
-                )
-                status = InteractionStatus.FAILURE
-                
-            elif failure_type == FailureType.INTEGRATION:
-                await self.failure_injector.inject_integration_failure(
-                    request.session_id, failure_mode
-                )
-                # This should raise an exception, but in case it doesn't:
-                failed_response = "Integration failure occurred"
-                status = InteractionStatus.FAILURE
-                
-            elif failure_type == FailureType.RESOURCE:
-                await self.failure_injector.inject_resource_failure(
-                    request.session_id, failure_mode, token_count
-                )
-                # This should raise an exception, but in case it doesn't:
-                failed_response = "Resource limit exceeded"
-                status = InteractionStatus.FAILURE
-            
-            else:
-                failed_response = "An unknown failure occurred"
-                status = InteractionStatus.FAILURE
-            
+            failure_type = self.failure_injector.type_by_mode[failure_mode]
+            handler = self.failure_injector.injector_by_type[failure_type]
+            failed_response = await handler(
+                request.session_id, failure_mode, request.message, "Normal response would go here", token_count
+            )
+            if failed_response is None:
+                # Integration/resource injectors should raise, but in case they don't:
+                failed_response = INJECTED_FALLBACK_RESPONSES[failure_type]
+            status = InteractionStatus.FAILURE
+
             return AgentResponse(
                 session_id=request.session_id,
                 response=failed_response,
@@ -561,12 +593,6 @@ class CustomerServiceAgent:
             model_used=request.model
         )
     
-    def _count_tokens(self, conversation_history: list) -> int:
-        total_tokens = 0
-        for message in conversation_history:
-            total_tokens += len(self.encoding.encode(message["content"]))
-        return total_tokens
-    
     async def reset_session(self, session_id: str):
         await self.state_manager.delete_state(session_id)
         await self.state_manager.reset_failure_count(session_id)
@@ -5,7 +5,8 @@ This module provides the main anomaly detection algorithms and scoring
 for behavioral pattern analysis.
 """
 
-from typing import List, Dict, Any, Optional, Tuple
+import functools
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 import structlog
 
@@ -15,6 +16,42 @@ from .temporal_analyzer import TemporalBehaviorAnalyzer
 
 logger = structlog.get_logger(__name__)
 
+# Metrics checked for statistical outliers, in column order
+OUTLIER_METRICS = ("response_latency", "message_length", "clarification_frequency")
+
+# Recommendation for each anomaly type
+RECOMMENDATION_BY_TYPE = {
+    "baseline_deviation": "Monitor agent performance for consistency issues",
+    "temporal_drift": "Check for gradual degradation in agent behavior over time",
+    "pattern_anomaly": "Investigate repetitive problematic interaction patterns",
+    "statistical_anomaly": "Review outlier behaviors for potential system issues",
+    "response_loop": "Agent appears stuck in response loop - restart or reset session",
+}
+
+
+@functools.lru_cache(maxsize=128)
+def _recommendations_for(anomaly_types: Tuple[str, ...],
+                         high_score: bool,
+                         low_confidence: bool) -> Tuple[str, ...]:
+    """Recommendations for one combination of detected anomaly types and flags."""
+    recommendations = []
+
+    if high_score:
+        recommendations.append("High anomaly score detected - immediate investigation recommended")
+
+    for anomaly_type in anomaly_types:
+        recommendation = RECOMMENDATION_BY_TYPE.get(anomaly_type)
+        if recommendation:
+            recommendations.append(recommendation)
+
+    if low_confidence:
+        recommendations.append("Low confidence in results - collect more behavioral data")
+
+    if not recommendations:
+        recommendations.append("No significant anomalies detected - continue monitoring")
+
+    return tuple(recommendations)
+
 
 class AnomalyDetector:
     """Core behavioral anomaly detection engine."""
@@ -54,68 +91,69 @@ class AnomalyDetector:
         Returns:
             Dict: Comprehensive anomaly analysis results
         """
-        anomaly_results = {
-            "session_id": session_id,
-            "timestamp": datetime.now(),
-            "anomalies_detected": [],
-            "anomaly_scores": {},
-            "overall_anomaly_score": 0.0,
-            "confidence": 0.0,
-            "recommendations": []
-        }
+        # One clock read shared by every time-dependent step below
+        now = datetime.now()
+
+        anomalies: List[Dict[str, Any]] = []
+        scores: Dict[str, float] = {}
 
         # 1. Baseline deviation detection
-        baseline_anomaly = self._detect_baseline_anomaly(current_behavior, session_behaviors)
+        baseline_anomaly = self._detect_baseline_anomaly(current_behavior, session_behaviors, now)
         if baseline_anomaly:
-            anomaly_results["anomalies_detected"].append(baseline_anomaly)
-            anomaly_results["anomaly_scores"]["baseline_deviation"] = baseline_anomaly["score"]
+            anomalies.append(baseline_anomaly)
+            scores["baseline_deviation"] = baseline_anomaly["score"]
 
         # 2. Temporal drift detection
         drift_anomaly = self._detect_drift_anomaly(session_behaviors)
         if drift_anomaly:
-            anomaly_results["anomalies_detected"].append(drift_anomaly)
-            anomaly_results["anomaly_scores"]["temporal_drift"] = drift_anomaly["score"]
+            anomalies.append(drift_anomaly)
+            scores["temporal_drift"] = drift_anomaly["score"]
 
         # 3. Pattern-based anomaly detection
         pattern_anomaly = self._detect_pattern_anomaly(session_behaviors)
         if pattern_anomaly:
-            anomaly_results["anomalies_detected"].append(pattern_anomaly)
-            anomaly_results["anomaly_scores"]["pattern_anomaly"] = pattern_anomaly["score"]
+            anomalies.append(pattern_anomaly)
+            scores["pattern_anomaly"] = pattern_anomaly["score"]
 
         # 4. Statistical anomaly detection
         statistical_anomaly = self._detect_statistical_anomaly(current_behavior, session_behaviors)
         if statistical_anomaly:
-            anomaly_results["anomalies_detected"].append(statistical_anomaly)
-            anomaly_results["anomaly_scores"]["statistical_anomaly"] = statistical_anomaly["score"]
+            anomalies.append(statistical_anomaly)
+            scores["statistical_anomaly"] = statistical_anomaly["score"]
 
         # 5. Loop detection
         if recent_responses:
             loop_anomaly = self._detect_loop_anomaly(recent_responses)
             if loop_anomaly:
-                anomaly_results["anomalies_detected"].append(loop_anomaly)
-                anomaly_results["anomaly_scores"]["response_loop"] = loop_anomaly["score"]
+                anomalies.append(loop_anomaly)
+                scores["response_loop"] = loop_anomaly["score"]
 
         # Calculate overall anomaly score
-        if anomaly_results["anomaly_scores"]:
-            anomaly_results["overall_anomaly_score"] = max(anomaly_results["anomaly_scores"].values())
+        overall_score = max(scores.values(), default=0.0)
 
         # Calculate confidence based on data availability
-        anomaly_results["confidence"] = self._calculate_confidence(session_behaviors)
-
-        # Generate recommendations
-        anomaly_results["recommendations"] = self._generate_recommendations(anomaly_results)
+        confidence = self._calculate_confidence(session_behaviors, now)
 
         logger.info("Anomaly detection completed",
                    session_id=session_id,
-                   anomalies_count=len(anomaly_results["anomalies_detected"]),
-                   overall_score=anomaly_results["overall_anomaly_score"],
-                   confidence=anomaly_results["confidence"])
+                   anomalies_count=len(anomalies),
+                   overall_score=overall_score,
+                   confidence=confidence)
 
-        return anomaly_results
+        return {
+            "session_id": session_id,
+            "timestamp": now,
+            "anomalies_detected": anomalies,
+            "anomaly_scores": scores,
+            "overall_anomaly_score": overall_score,
+            "confidence": confidence,
+            "recommendations": self._generate_recommendations(anomalies, overall_score, confidence)
+        }
 
     def _detect_baseline_anomaly(self,
                                 current_behavior: InteractionBehavior,
-                                session_behaviors: List[InteractionBehavior]) -> Optional[Dict[str, Any]]:
+                                session_behaviors: List[InteractionBehavior],
+                                now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
         """Detect anomalies based on established baseline."""
         baseline = self.baseline_manager.get_baseline(current_behavior.session_id)
 
@@ -123,7 +161,7 @@ class AnomalyDetector:
             # Try to establish baseline if we have enough data
             if len(session_behaviors) >= self.baseline_manager.min_interactions:
                 baseline = self.baseline_manager.establish_baseline(
-                    current_behavior.session_id, session_behaviors
+                    current_behavior.session_id, session_behaviors, now
                 )
 
             if not baseline:
@@ -198,23 +236,19 @@ class AnomalyDetector:
         if len(session_behaviors) < 3:
             return None
 
-        # Analyze each metric for outliers
-        anomalies = []
-
-        # Response latency outlier detection
-        latencies = [b.response_latency_ms for b in session_behaviors]
-        if self._is_outlier(current_behavior.response_latency_ms, latencies):
-            anomalies.append("response_latency")
-
-        # Message length outlier detection
-        lengths = [b.message_length for b in session_behaviors]
-        if self._is_outlier(current_behavior.message_length, lengths):
-            anomalies.append("message_length")
-
-        # Clarification frequency outlier detection
-        clarifications = [b.clarification_frequency for b in session_behaviors]
-        if self._is_outlier(current_behavior.clarification_frequency, clarifications):
-            anomalies.append("clarification_frequency")
+        # Analyze each metric for outliers; all metric columns are extracted in one pass
+        columns = zip(*(
+            (b.response_latency_ms, b.message_length, b.clarification_frequency)
+            for b in session_behaviors
+        ))
+        latency_ms = current_behavior.response_latency_ms
+        message_length = current_behavior.message_length
+        clarification = current_behavior.clarification_frequency
+        current_values = (latency_ms, message_length, clarification)
+        anomalies = [
+            metric for metric, value, historical_values in zip(OUTLIER_METRICS, current_values, columns)
+            if self._is_outlier(value, historical_values)
+        ]
 
         if anomalies:
             # Calculate composite anomaly score
@@ -227,9 +261,9 @@ class AnomalyDetector:
                 "details": {
                     "outlier_metrics": anomalies,
                     "current_values": {
-                        "latency": current_behavior.response_latency_ms,
-                        "length": current_behavior.message_length,
-                        "clarification": current_behavior.clarification_frequency,
+                        "latency": latency_ms,
+                        "length": message_length,
+                        "clarification": clarification,
                         "confidence": current_behavior.confidence_expressions
                     }
                 }
@@ -251,7 +285,7 @@ class AnomalyDetector:
 
         return None
 
-    def _is_outlier(self, value: float, historical_values: List[float], threshold: float = 2.0) -> bool:
+    def _is_outlier(self, value: float, historical_values: Sequence[float], threshold: float = 2.0) -> bool:
         """
         Detect if a value is a statistical outlier using modified Z-score.
 
@@ -266,12 +300,12 @@ class AnomalyDetector:
         if len(historical_values) < 3:
             return False
 
-        # Calculate median and median absolute deviation
-        sorted_values = sorted(historical_values)
-        median = sorted_values[len(sorted_values) // 2]
+        # Calculate median and median absolute deviation (deviations sorted in place)
+        median = sorted(historical_values)[len(historical_values) // 2]
 
         deviations = [abs(v - median) for v in historical_values]
-        mad = sorted(deviations)[len(deviations) // 2]
+        deviations.sort()
+        mad = deviations[len(deviations) // 2]
 
         if mad == 0:
             return False
@@ -281,7 +315,8 @@ class AnomalyDetector:
 
         return abs(modified_z_score) > threshold
 
-    def _calculate_confidence(self, session_behaviors: List[InteractionBehavior]) -> float:
+    def _calculate_confidence(self, session_behaviors: List[InteractionBehavior],
+                              now: Optional[datetime] = None) -> float:
         """Calculate confidence in anomaly detection based on data availability."""
         # More data = higher confidence
         data_confidence = min(len(session_behaviors) / 20.0, 1.0)
@@ -289,39 +324,23 @@ class AnomalyDetector:
         # Recent data = higher confidence
         if session_behaviors:
             latest_behavior = session_behaviors[-1]
-            time_since_latest = datetime.now() - latest_behavior.timestamp
+            time_since_latest = (now or datetime.now()) - latest_behavior.timestamp
             recency_confidence = max(0.0, 1.0 - (time_since_latest.total_seconds() / (24 * 3600)))
         else:
             recency_confidence = 0.0
 
         return (data_confidence + recency_confidence) / 2.0
 
-    def _generate_recommendations(self, anomaly_results: Dict[str, Any]) -> List[str]:
+    def _generate_recommendations(self,
+                                  anomalies: List[Dict[str, Any]],
+                                  overall_score: float,
+                                  confidence: float) -> List[str]:
         """Generate actionable recommendations based on anomaly results."""
-        recommendations = []
-
-        if anomaly_results["overall_anomaly_score"] >= 0.8:
-            recommendations.append("High anomaly score detected - immediate investigation recommended")
-
-        for anomaly in anomaly_results["anomalies_detected"]:
-            if anomaly["type"] == "baseline_deviation":
-                recommendations.append("Monitor agent performance for consistency issues")
-            elif anomaly["type"] == "temporal_drift":
-                recommendations.append("Check for gradual degradation in agent behavior over time")
-            elif anomaly["type"] == "pattern_anomaly":
-                recommendations.append("Investigate repetitive problematic interaction patterns")
-            elif anomaly["type"] == "statistical_anomaly":
-                recommendations.append("Review outlier behaviors for potential system issues")
-            elif anomaly["type"] == "response_loop":
-                recommendations.append("Agent appears stuck in response loop - restart or reset session")
-
-        if anomaly_results["confidence"] < 0.5:
-            recommendations.append("Low confidence in results - collect more behavioral data")
-
-        if not recommendations:
-            recommendations.append("No significant anomalies detected - continue monitoring")
-
-        return recommendations
+        return list(_recommendations_for(
+            tuple(anomaly["type"] for anomaly in anomalies),
+            overall_score >= 0.8,
+            confidence < 0.5
+        ))
 
     def update_thresholds(self, anomaly_threshold: float, drift_threshold: float) -> None:
         """Update anomaly detection thresholds."""
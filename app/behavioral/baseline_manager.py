@@ -6,13 +6,73 @@ enabling detection of behavioral deviations and anomalies.
 """
 
 import statistics
+import logging
+from array import array
+from math import fsum
+from operator import mul
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import structlog
 
 from ..models import InteractionBehavior, BehavioralBaseline
+from .stats import welford_update
 
 logger = structlog.get_logger(__name__)
+# Backing stdlib logger, for cheap level checks before building debug kwargs
+_stdlib_logger = logging.getLogger(__name__)
+
+# Weights for latency, length, clarification and confidence deviations
+DEVIATION_WEIGHTS = (0.3, 0.2, 0.3, 0.2)
+
+# Fixed layout of the confidence pattern produced by _analyze_confidence_pattern
+CONFIDENCE_PATTERN_KEYS = ("average", "variance", "max", "min")
+
+
+def _deviation_components(
+    latency: float,
+    length: int,
+    clarification: float,
+    confidence: float,
+    baseline_latency: float,
+    min_length: int,
+    max_length: int,
+    baseline_clarification: float,
+    baseline_confidence: float
+) -> Tuple[float, float, float, float]:
+    """
+    Per-metric deviations from a baseline, each capped at 1.0.
+
+    Works on plain scalars only, so the scoring arithmetic runs without
+    model attribute or dict lookups.
+
+    Returns:
+        Tuple: (latency, length, clarification, confidence) deviations
+    """
+    # Response latency deviation
+    latency_deviation = abs(latency - baseline_latency) / max(baseline_latency, 1)
+
+    # Message length deviation
+    if length < min_length:
+        length_deviation = (min_length - length) / max(min_length, 1)
+    elif length > max_length:
+        length_deviation = (length - max_length) / max(max_length, 1)
+    else:
+        length_deviation = 0.0
+
+    # Clarification frequency deviation
+    clarification_deviation = abs(clarification - baseline_clarification)
+
+    # Confidence expression deviation
+    confidence_deviation = abs(confidence - baseline_confidence) / max(baseline_confidence + 1, 1)
+
+    # Cap each component at 1.0 (all are non-negative); inline comparisons skip
+    # four builtin min() calls
+    return (
+        latency_deviation if latency_deviation < 1.0 else 1.0,
+        length_deviation if length_deviation < 1.0 else 1.0,
+        clarification_deviation if clarification_deviation < 1.0 else 1.0,
+        confidence_deviation if confidence_deviation < 1.0 else 1.0
+    )
 
 
 class BaselineManager:
@@ -30,10 +90,28 @@ class BaselineManager:
         self.update_frequency_hours = update_frequency_hours
         self.baselines: Dict[str, BehavioralBaseline] = {}
 
+        # Struct-of-arrays copy of the fields deviation scoring reads, one row per
+        # session, in _deviation_components' baseline argument order
+        self._avg_latency = array('d')
+        self._min_length = array('d')
+        self._max_length = array('d')
+        self._clarification_rate = array('d')
+        self._confidence_average = array('d')
+        self._columns = (
+            self._avg_latency,
+            self._min_length,
+            self._max_length,
+            self._clarification_rate,
+            self._confidence_average
+        )
+        self._rows: Dict[str, int] = {}
+        self._row_sessions: List[str] = []
+
     def establish_baseline(
         self,
         session_id: str,
-        behaviors: List[InteractionBehavior]
+        behaviors: List[InteractionBehavior],
+        now: Optional[datetime] = None
     ) -> Optional[BehavioralBaseline]:
         """
         Establish a behavioral baseline for a session.
@@ -41,6 +119,7 @@ class BaselineManager:
         Args:
             session_id: Session identifier
             behaviors: List of interaction behaviors
+            now: Current time, if the caller already has it
 
         Returns:
             Optional[BehavioralBaseline]: Established baseline or None if insufficient data
@@ -52,29 +131,41 @@ class BaselineManager:
                         min_required=self.min_interactions)
             return None
 
-        # Calculate baseline metrics
-        response_latencies = [b.response_latency_ms for b in behaviors]
-        message_lengths = [b.message_length for b in behaviors]
-        clarification_rates = [b.clarification_frequency for b in behaviors]
-        conversation_depths = [b.conversation_turns for b in behaviors]
-        confidence_expressions = [b.confidence_expressions for b in behaviors]
+        now = now or datetime.now()
+
+        # Calculate baseline metrics: extract all columns in one pass, then reduce
+        # each with C-level builtins (fsum keeps float means correctly rounded)
+        (response_latencies, message_lengths, clarification_rates,
+         conversation_depths, confidence_expressions) = zip(*(
+            (b.response_latency_ms, b.message_length, b.clarification_frequency,
+             b.conversation_turns, b.confidence_expressions)
+            for b in behaviors
+        ))
+        count = len(behaviors)
 
         # Calculate averages and ranges
-        avg_response_latency = statistics.mean(response_latencies)
+        avg_response_latency = fsum(response_latencies) / count
 
         # Message length range (min to max for typical range)
-        message_lengths_sorted = sorted(message_lengths)
-        typical_length_range = (
-            message_lengths_sorted[0],
-            message_lengths_sorted[-1]
-        )
+        typical_length_range = (min(message_lengths), max(message_lengths))
 
-        normal_clarification_rate = statistics.mean(clarification_rates)
-        standard_conversation_depth = int(statistics.mean(conversation_depths))
+        normal_clarification_rate = fsum(clarification_rates) / count
+        standard_conversation_depth = sum(conversation_depths) // count
 
         # Confidence pattern (frequency distribution)
         confidence_pattern = self._analyze_confidence_pattern(confidence_expressions)
 
+        # Seed the running statistics that later updates maintain incrementally
+        running_count, running_mean_latency, running_m2_latency = welford_update(
+            0, 0.0, 0.0, response_latencies
+        )
+        _, running_mean_clarification, running_m2_clarification = welford_update(
+            0, 0.0, 0.0, clarification_rates
+        )
+        _, running_mean_confidence, running_m2_confidence = welford_update(
+            0, 0.0, 0.0, confidence_expressions
+        )
+
         baseline = BehavioralBaseline(
             session_id=session_id,
             avg_response_latency=avg_response_latency,
@@ -83,11 +174,18 @@ class BaselineManager:
             standard_conversation_depth=standard_conversation_depth,
             confidence_pattern=confidence_pattern,
             interaction_count=len(behaviors),
-            established_at=datetime.now(),
-            last_updated=datetime.now()
+            established_at=now,
+            last_updated=now,
+            running_count=running_count,
+            running_mean_latency=running_mean_latency,
+            running_m2_latency=running_m2_latency,
+            running_mean_clarification=running_mean_clarification,
+            running_m2_clarification=running_m2_clarification,
+            running_mean_confidence=running_mean_confidence,
+            running_m2_confidence=running_m2_confidence
         )
 
-        self.baselines[session_id] = baseline
+        self._store_baseline(baseline)
 
         logger.info("Established behavioral baseline",
                    session_id=session_id,
@@ -101,7 +199,8 @@ class BaselineManager:
     def update_baseline(
         self,
         session_id: str,
-        new_behaviors: List[InteractionBehavior]
+        new_behaviors: List[InteractionBehavior],
+        now: Optional[datetime] = None
     ) -> Optional[BehavioralBaseline]:
         """
         Update an existing baseline with new behavior data.
@@ -109,16 +208,18 @@ class BaselineManager:
         Args:
             session_id: Session identifier
             new_behaviors: New interaction behaviors
+            now: Current time, if the caller already has it
 
         Returns:
             Optional[BehavioralBaseline]: Updated baseline
         """
+        now = now or datetime.now()
         existing_baseline = self.baselines.get(session_id)
         if not existing_baseline:
-            return self.establish_baseline(session_id, new_behaviors)
+            return self.establish_baseline(session_id, new_behaviors, now)
 
         # Check if update is needed based on time
-        time_since_update = datetime.now() - existing_baseline.last_updated
+        time_since_update = now - existing_baseline.last_updated
         if time_since_update.total_seconds() < self.update_frequency_hours * 3600:
             return existing_baseline
 
@@ -128,44 +229,53 @@ class BaselineManager:
         existing_weight = 0.7  # 70% weight to existing baseline
 
         if new_behaviors:
-            # Calculate new metrics
-            new_avg_latency = statistics.mean([b.response_latency_ms for b in new_behaviors])
-            new_message_lengths = [b.message_length for b in new_behaviors]
-            new_clarification_rate = statistics.mean([b.clarification_frequency for b in new_behaviors])
-            new_confidence_expressions = [b.confidence_expressions for b in new_behaviors]
-
-            # Update with weighted average
-            updated_avg_latency = (
-                existing_weight * existing_baseline.avg_response_latency +
-                recent_weight * new_avg_latency
+            # Extract the new columns in a single pass
+            new_latencies, new_message_lengths, new_clarification_rates, new_confidence_expressions = zip(*(
+                (b.response_latency_ms, b.message_length, b.clarification_frequency, b.confidence_expressions)
+                for b in new_behaviors
+            ))
+
+            # Fold the batch into the running statistics in O(1) per behavior. History is
+            # first decayed by existing_weight, so with steady batch sizes the new data's
+            # share of each running mean settles at recent_weight, as the old blend had it
+            decayed_count = existing_weight * existing_baseline.running_count
+            running_count, running_mean_latency, running_m2_latency = welford_update(
+                decayed_count,
+                existing_baseline.running_mean_latency,
+                existing_weight * existing_baseline.running_m2_latency,
+                new_latencies
+            )
+            _, running_mean_clarification, running_m2_clarification = welford_update(
+                decayed_count,
+                existing_baseline.running_mean_clarification,
+                existing_weight * existing_baseline.running_m2_clarification,
+                new_clarification_rates
+            )
+            _, running_mean_confidence, running_m2_confidence = welford_update(
+                decayed_count,
+                existing_baseline.running_mean_confidence,
+                existing_weight * existing_baseline.running_m2_confidence,
+                new_confidence_expressions
             )
 
-            # Update message length range with recent data
-            all_lengths = new_message_lengths
-            if all_lengths:
-                all_lengths_sorted = sorted(all_lengths)
-                q1_idx = len(all_lengths_sorted) // 4
-                q3_idx = 3 * len(all_lengths_sorted) // 4
-                new_length_range = (
-                    all_lengths_sorted[q1_idx] if all_lengths_sorted else existing_baseline.typical_message_length_range[0],
-                    all_lengths_sorted[q3_idx] if all_lengths_sorted else existing_baseline.typical_message_length_range[1]
-                )
-                # Blend with existing range
-                updated_length_range = (
-                    int(existing_weight * existing_baseline.typical_message_length_range[0] +
-                        recent_weight * new_length_range[0]),
-                    int(existing_weight * existing_baseline.typical_message_length_range[1] +
-                        recent_weight * new_length_range[1])
-                )
-            else:
-                updated_length_range = existing_baseline.typical_message_length_range
+            updated_avg_latency = running_mean_latency
+            updated_clarification_rate = running_mean_clarification
 
-            updated_clarification_rate = (
-                existing_weight * existing_baseline.normal_clarification_rate +
-                recent_weight * new_clarification_rate
+            # Update message length range with the interquartile range of recent data
+            # (linearly interpolated, as np.percentile would)
+            if len(new_message_lengths) > 1:
+                q1, _, q3 = statistics.quantiles(new_message_lengths, n=4, method='inclusive')
+            else:
+                q1 = q3 = new_message_lengths[0]
+            # Blend with existing range
+            existing_min, existing_max = existing_baseline.typical_message_length_range
+            updated_length_range = (
+                int(existing_weight * existing_min + recent_weight * q1),
+                int(existing_weight * existing_max + recent_weight * q3)
             )
 
-            # Update confidence pattern
+            # Update confidence pattern: extremes are blended, mean and variance
+            # come from the running statistics
             new_confidence_pattern = self._analyze_confidence_pattern(new_confidence_expressions)
             updated_confidence_pattern = self._blend_confidence_patterns(
                 existing_baseline.confidence_pattern,
@@ -173,6 +283,10 @@ class BaselineManager:
                 existing_weight,
                 recent_weight
             )
+            updated_confidence_pattern["average"] = running_mean_confidence
+            updated_confidence_pattern["variance"] = (
+                running_m2_confidence / (running_count - 1) if running_count > 1 else 0.0
+            )
 
             updated_baseline = BehavioralBaseline(
                 session_id=session_id,
@@ -183,10 +297,17 @@ class BaselineManager:
                 confidence_pattern=updated_confidence_pattern,
                 interaction_count=existing_baseline.interaction_count + len(new_behaviors),
                 established_at=existing_baseline.established_at,
-                last_updated=datetime.now()
+                last_updated=now,
+                running_count=running_count,
+                running_mean_latency=running_mean_latency,
+                running_m2_latency=running_m2_latency,
+                running_mean_clarification=running_mean_clarification,
+                running_m2_clarification=running_m2_clarification,
+                running_mean_confidence=running_mean_confidence,
+                running_m2_confidence=running_m2_confidence
             )
 
-            self.baselines[session_id] = updated_baseline
+            self._store_baseline(updated_baseline)
 
             logger.info("Updated behavioral baseline",
                        session_id=session_id,
@@ -212,49 +333,76 @@ class BaselineManager:
         Returns:
             float: Deviation score (0.0 = no deviation, 1.0 = maximum deviation)
         """
-        deviations = []
-
-        # Response latency deviation
-        latency_deviation = abs(current_behavior.response_latency_ms - baseline.avg_response_latency)
-        latency_relative_deviation = latency_deviation / max(baseline.avg_response_latency, 1)
-        deviations.append(min(latency_relative_deviation, 1.0))
-
-        # Message length deviation
-        min_length, max_length = baseline.typical_message_length_range
-        if current_behavior.message_length < min_length:
-            length_deviation = (min_length - current_behavior.message_length) / max(min_length, 1)
-        elif current_behavior.message_length > max_length:
-            length_deviation = (current_behavior.message_length - max_length) / max(max_length, 1)
+        row = self._rows.get(baseline.session_id)
+        if row is not None and self.baselines[baseline.session_id] is baseline:
+            baseline_values = tuple(column[row] for column in self._columns)
         else:
-            length_deviation = 0.0
-        deviations.append(min(length_deviation, 1.0))
+            # Baseline not managed here (or superseded): read it from the model
+            min_length, max_length = baseline.typical_message_length_range
+            baseline_values = (
+                baseline.avg_response_latency,
+                min_length,
+                max_length,
+                baseline.normal_clarification_rate,
+                baseline.confidence_pattern.get('average', 0)
+            )
 
-        # Clarification frequency deviation
-        clarification_deviation = abs(
-            current_behavior.clarification_frequency - baseline.normal_clarification_rate
+        deviations = _deviation_components(
+            current_behavior.response_latency_ms,
+            current_behavior.message_length,
+            current_behavior.clarification_frequency,
+            current_behavior.confidence_expressions,
+            *baseline_values
         )
-        deviations.append(min(clarification_deviation, 1.0))
-
-        # Confidence expression deviation
-        baseline_confidence = baseline.confidence_pattern.get('average', 0)
-        confidence_deviation = abs(current_behavior.confidence_expressions - baseline_confidence)
-        confidence_relative_deviation = confidence_deviation / max(baseline_confidence + 1, 1)
-        deviations.append(min(confidence_relative_deviation, 1.0))
 
         # Overall deviation score (weighted average)
-        weights = [0.3, 0.2, 0.3, 0.2]  # latency, length, clarification, confidence
-        overall_deviation = sum(d * w for d, w in zip(deviations, weights))
+        overall_deviation = sum(map(mul, deviations, DEVIATION_WEIGHTS))
 
-        logger.debug("Calculated behavioral deviation",
-                    session_id=current_behavior.session_id,
-                    overall_deviation=overall_deviation,
-                    latency_deviation=deviations[0],
-                    length_deviation=deviations[1],
-                    clarification_deviation=deviations[2],
-                    confidence_deviation=deviations[3])
+        if _stdlib_logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Calculated behavioral deviation",
+                        session_id=current_behavior.session_id,
+                        overall_deviation=overall_deviation,
+                        latency_deviation=deviations[0],
+                        length_deviation=deviations[1],
+                        clarification_deviation=deviations[2],
+                        confidence_deviation=deviations[3])
 
         return overall_deviation
 
+    def detect_deviation_batch(
+        self,
+        current_behaviors: List[InteractionBehavior]
+    ) -> List[Optional[float]]:
+        """
+        Detect deviations for many sessions' current behaviors at once.
+
+        Reads the baseline columns directly, skipping model access and per-item logging.
+
+        Args:
+            current_behaviors: Current behaviors, typically one per active session
+
+        Returns:
+            List[Optional[float]]: Deviation score per behavior, None where the
+                session has no baseline
+        """
+        rows = self._rows
+        columns = self._columns
+        scores: List[Optional[float]] = []
+        for behavior in current_behaviors:
+            row = rows.get(behavior.session_id)
+            if row is None:
+                scores.append(None)
+                continue
+            deviations = _deviation_components(
+                behavior.response_latency_ms,
+                behavior.message_length,
+                behavior.clarification_frequency,
+                behavior.confidence_expressions,
+                *[column[row] for column in columns]
+            )
+            scores.append(sum(map(mul, deviations, DEVIATION_WEIGHTS)))
+        return scores
+
     def get_baseline(self, session_id: str) -> Optional[BehavioralBaseline]:
         """Get baseline for a session."""
         return self.baselines.get(session_id)
@@ -267,8 +415,43 @@ class BaselineManager:
         """Remove baseline for a session."""
         if session_id in self.baselines:
             del self.baselines[session_id]
+
+            # Move the last row into the freed slot so the columns stay dense
+            row = self._rows.pop(session_id)
+            last_session = self._row_sessions.pop()
+            for column in self._columns:
+                last_value = column.pop()
+                if last_session != session_id:
+                    column[row] = last_value
+            if last_session != session_id:
+                self._row_sessions[row] = last_session
+                self._rows[last_session] = row
+
             logger.info("Removed behavioral baseline", session_id=session_id)
 
+    def _store_baseline(self, baseline: BehavioralBaseline) -> None:
+        """Register a baseline and mirror its scoring fields into the column arrays."""
+        session_id = baseline.session_id
+        self.baselines[session_id] = baseline
+
+        min_length, max_length = baseline.typical_message_length_range
+        values = (
+            baseline.avg_response_latency,
+            min_length,
+            max_length,
+            baseline.normal_clarification_rate,
+            baseline.confidence_pattern.get('average', 0)
+        )
+        row = self._rows.get(session_id)
+        if row is None:
+            self._rows[session_id] = len(self._row_sessions)
+            self._row_sessions.append(session_id)
+            for column, value in zip(self._columns, values):
+                column.append(value)
+        else:
+            for column, value in zip(self._columns, values):
+                column[row] = value
+
     def _analyze_confidence_pattern(self, confidence_expressions: List[int]) -> Dict[str, float]:
         """
         Analyze confidence expression patterns.
@@ -282,9 +465,15 @@ class BaselineManager:
         if not confidence_expressions:
             return {"average": 0.0, "variance": 0.0, "max": 0, "min": 0}
 
+        # Counts are integers, so sum and sum of squares are exact and the sample
+        # variance needs only a single rounding, matching statistics.variance
+        count = len(confidence_expressions)
+        total = sum(confidence_expressions)
+        total_squares = sum(x * x for x in confidence_expressions)
+
         return {
-            "average": statistics.mean(confidence_expressions),
-            "variance": statistics.variance(confidence_expressions) if len(confidence_expressions) > 1 else 0.0,
+            "average": total / count,
+            "variance": (count * total_squares - total * total) / (count * (count - 1)) if count > 1 else 0.0,
             "max": max(confidence_expressions),
             "min": min(confidence_expressions)
         }
@@ -297,13 +486,8 @@ class BaselineManager:
         new_weight: float
     ) -> Dict[str, float]:
         """Blend two confidence patterns with weights."""
-        blended = {}
-        for key in existing_pattern:
-            if key in new_pattern:
-                blended[key] = (
-                    existing_weight * existing_pattern[key] +
-                    new_weight * new_pattern[key]
-                )
-            else:
-                blended[key] = existing_pattern[key]
-        return blended
\ No newline at end of file
+        # Both patterns come from _analyze_confidence_pattern, so share a fixed key set
+        return {
+            key: existing_weight * existing_pattern[key] + new_weight * new_pattern[key]
+            for key in CONFIDENCE_PATTERN_KEYS
+        }
\ No newline at end of file
@@ -6,29 +6,121 @@ providing the foundation for baseline establishment and anomaly detection.
 """
 
 import re
+import sys
+import logging
 import time
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, Dict, Any, List, Optional
 from datetime import datetime
 import structlog
 
 from ..models import AgentRequest, AgentResponse, InteractionBehavior
 
 logger = structlog.get_logger(__name__)
+_stdlib_logger = logging.getLogger(__name__)
+
+# Behaviors retained per session; detectors only ever read a recent window of them
+MAX_SESSION_BEHAVIORS = 200
+
+# Response texts retained per session for loop detection
+MAX_SESSION_RESPONSES = 10
+
+# Sessions tracked at once; the least recently active session is evicted beyond this
+MAX_TRACKED_SESSIONS = 10000
+
+# Behavioral phrase patterns, matched case-insensitively against the response text
+CLARIFICATION_PATTERNS = [
+    r'\b(could you|can you|please)\s+(clarify|explain|tell me more)',
+    r'\b(what do you mean|I don\'t understand|unclear)',
+    r'\?[^?\n]*\?',  # Questions ending with question marks
+    r'\b(help me understand|need more information)',
+]
+CONFIDENCE_PATTERNS = [
+    r'\b(I think|I believe|I assume|probably|likely|maybe|perhaps)',
+    r'\b(definitely|certainly|absolutely|sure|confident)',
+    r'\b(not sure|uncertain|unclear|might be|could be)',
+    r'\b(in my opinion|from my perspective)',
+]
+
+# Each category fused into one alternation so a response is scanned once per category
+CLARIFICATION_RE = re.compile("|".join(f"(?:{p})" for p in CLARIFICATION_PATTERNS), re.IGNORECASE)
+CONFIDENCE_RE = re.compile("|".join(f"(?:{p})" for p in CONFIDENCE_PATTERNS), re.IGNORECASE)
+
+# Lowercase literals of which every match of a category contains at least one;
+# a response containing none of them cannot match and skips the regex scan
+CLARIFICATION_LITERALS = (
+    'clarify', 'explain', 'tell me more', 'what do you mean', "i don't understand",
+    'unclear', '?', 'help me understand', 'need more information',
+)
+CONFIDENCE_LITERALS = (
+    'i think', 'i believe', 'i assume', 'probably', 'likely', 'maybe', 'perhaps',
+    'definitely', 'certainly', 'absolutely', 'sure', 'confident',
+    'uncertain', 'unclear', 'might be', 'could be', 'in my opinion', 'from my perspective',
+)
+
+# Words ignored when comparing user and agent vocabulary for topic switches
+STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+
+@dataclass(slots=True)
+class SessionAggregates:
+    """Running totals over every behavior tracked for a session."""
+    count: int = 0
+    sum_latency: float = 0.0
+    sum_length: int = 0
+    sum_switches: int = 0
+    sum_clarification: float = 0.0
+    sum_confidence: int = 0
+    last_behavior: Optional[InteractionBehavior] = None
+    last_behavior_data: Optional[Dict[str, Any]] = None  # Dump of last_behavior, built on first read
+
+    def add(self, behavior: InteractionBehavior) -> None:
+        self.count += 1
+        self.sum_latency += behavior.response_latency_ms
+        self.sum_length += behavior.message_length
+        self.sum_switches += behavior.topic_switches
+        self.sum_clarification += behavior.clarification_frequency
+        self.sum_confidence += behavior.confidence_expressions
+        self.last_behavior = behavior
+        self.last_behavior_data = None
+
+    def latest_behavior_data(self) -> Dict[str, Any]:
+        """Dump of the latest behavior; the model is only dumped once per behavior."""
+        if self.last_behavior_data is None:
+            self.last_behavior_data = self.last_behavior.model_dump()
+        return dict(self.last_behavior_data)
 
 
 class InteractionTracker:
     """Tracks behavioral metrics for agent interactions."""
 
-    def __init__(self):
-        self.session_behaviors: Dict[str, List[InteractionBehavior]] = {}
-        self.session_responses: Dict[str, List[str]] = {}  # Store response texts for loop detection
+    def __init__(self,
+                 max_behaviors_per_session: int = MAX_SESSION_BEHAVIORS,
+                 max_sessions: int = MAX_TRACKED_SESSIONS):
+        """
+        Initialize interaction tracker.
+
+        Args:
+            max_behaviors_per_session: Most recent behaviors kept per session; older
+                ones are dropped, but still count towards turns and session metrics
+            max_sessions: Sessions kept in memory; the least recently active one is
+                dropped when a new session would exceed this
+        """
+        self.max_behaviors_per_session = max_behaviors_per_session
+        self.max_sessions = max_sessions
+        self.session_behaviors: Dict[str, Deque[InteractionBehavior]] = {}
+        # Ordered by recency of activity, least recent first
+        self.session_aggregates: OrderedDict[str, SessionAggregates] = OrderedDict()
+        self.session_responses: Dict[str, Deque[str]] = {}  # Store response texts for loop detection
 
     def track_interaction(
         self,
         session_id: str,
         request: AgentRequest,
         response: AgentResponse,
-        start_time: float
+        start_time: int
     ) -> InteractionBehavior:
         """
         Track behavioral metrics for a single interaction.
@@ -37,23 +129,35 @@ class InteractionTracker:
             session_id: Session identifier
             request: The agent request
             response: The agent response
-            start_time: When processing started (time.time())
+            start_time: When processing started (time.monotonic_ns())
 
         Returns:
             InteractionBehavior: Calculated behavioral metrics
         """
+        # Interned so every per-session dict shares one key object per session
+        session_id = sys.intern(session_id)
+
         response_latency_ms = response.processing_time_ms
         message_length = len(response.response)
 
-        # Get conversation history for context
-        conversation_turns = self._count_conversation_turns(session_id)
+        # This interaction's turn number within the session
+        aggregates = self.session_aggregates.get(session_id)
+        conversation_turns = aggregates.count + 1 if aggregates is not None else 1
 
-        # Calculate behavioral metrics
+        # Calculate behavioral metrics; both phrase counts prefilter on one lowercased copy
+        response_lower = response.response.lower()
         clarification_frequency = self._calculate_clarification_frequency(
-            response.response, conversation_turns
+            response_lower, conversation_turns
         )
         topic_switches = self._detect_topic_switches(session_id, request.message, response.response)
-        confidence_expressions = self._count_confidence_expressions(response.response)
+        confidence_expressions = self._count_confidence_expressions(response_lower)
+
+        # Session histories stay chronological even if the wall clock steps back,
+        # so time-window consumers can binary search them
+        behaviors = self.session_behaviors.get(session_id)
+        timestamp = datetime.now()
+        if behaviors and timestamp < behaviors[-1].timestamp:
+            timestamp = behaviors[-1].timestamp
 
         behavior = InteractionBehavior(
             session_id=session_id,
@@ -63,27 +167,34 @@ class InteractionTracker:
             clarification_frequency=clarification_frequency,
             topic_switches=topic_switches,
             confidence_expressions=confidence_expressions,
-            timestamp=datetime.now()
+            timestamp=timestamp
         )
 
-        # Store behavior in session history
-        if session_id not in self.session_behaviors:
-            self.session_behaviors[session_id] = []
-        self.session_behaviors[session_id].append(behavior)
+        # Store behavior in the bounded session history
+        if behaviors is None:
+            behaviors = self.session_behaviors[session_id] = deque(maxlen=self.max_behaviors_per_session)
+        behaviors.append(behavior)
+        if aggregates is None:
+            aggregates = self.session_aggregates[session_id] = SessionAggregates()
+            if len(self.session_aggregates) > self.max_sessions:
+                self._evict_least_recent_session()
+        else:
+            self.session_aggregates.move_to_end(session_id)
+        aggregates.add(behavior)
 
         # Store response text for loop detection (keep last 10 responses)
-        if session_id not in self.session_responses:
-            self.session_responses[session_id] = []
-        self.session_responses[session_id].append(response.response)
-        if len(self.session_responses[session_id]) > 10:
-            self.session_responses[session_id] = self.session_responses[session_id][-10:]
-
-        logger.debug("Tracked interaction behavior",
-                    session_id=session_id,
-                    response_latency_ms=response_latency_ms,
-                    message_length=message_length,
-                    clarification_frequency=clarification_frequency,
-                    confidence_expressions=confidence_expressions)
+        responses = self.session_responses.get(session_id)
+        if responses is None:
+            responses = self.session_responses[session_id] = deque(maxlen=MAX_SESSION_RESPONSES)
+        responses.append(response.response)
+
+        if _stdlib_logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Tracked interaction behavior",
+                        session_id=session_id,
+                        response_latency_ms=response_latency_ms,
+                        message_length=message_length,
+                        clarification_frequency=clarification_frequency,
+                        confidence_expressions=confidence_expressions)
 
         return behavior
 
@@ -97,9 +208,9 @@ class InteractionTracker:
         Returns:
             Dict: Aggregated behavioral metrics
         """
-        behaviors = self.session_behaviors.get(session_id, [])
+        aggregates = self.session_aggregates.get(session_id)
 
-        if not behaviors:
+        if aggregates is None:
             return {
                 "interaction_count": 0,
                 "avg_response_latency": 0,
@@ -109,14 +220,15 @@ class InteractionTracker:
                 "avg_confidence_expressions": 0
             }
 
+        count = aggregates.count
         return {
-            "interaction_count": len(behaviors),
-            "avg_response_latency": sum(b.response_latency_ms for b in behaviors) / len(behaviors),
-            "avg_message_length": sum(b.message_length for b in behaviors) / len(behaviors),
-            "total_topic_switches": sum(b.topic_switches for b in behaviors),
-            "avg_clarification_frequency": sum(b.clarification_frequency for b in behaviors) / len(behaviors),
-            "avg_confidence_expressions": sum(b.confidence_expressions for b in behaviors) / len(behaviors),
-            "latest_behavior": behaviors[-1].model_dump() if behaviors else None
+            "interaction_count": count,
+            "avg_response_latency": aggregates.sum_latency / count,
+            "avg_message_length": aggregates.sum_length / count,
+            "total_topic_switches": aggregates.sum_switches,
+            "avg_clarification_frequency": aggregates.sum_clarification / count,
+            "avg_confidence_expressions": aggregates.sum_confidence / count,
+            "latest_behavior": aggregates.latest_behavior_data()
         }
 
     def get_recent_behaviors(self, session_id: str, count: int = 10) -> List[InteractionBehavior]:
@@ -128,10 +240,12 @@ class InteractionTracker:
             count: Number of recent behaviors to return
 
         Returns:
-            List[InteractionBehavior]: Recent behaviors, newest first
+            List[InteractionBehavior]: Recent behaviors, oldest first
         """
-        behaviors = self.session_behaviors.get(session_id, [])
-        return behaviors[-count:] if behaviors else []
+        behaviors = self.session_behaviors.get(session_id)
+        if not behaviors:
+            return []
+        return list(islice(behaviors, max(len(behaviors) - count, 0), None))
 
     def get_recent_responses(self, session_id: str, count: int = 5) -> List[str]:
         """
@@ -144,38 +258,26 @@ class InteractionTracker:
         Returns:
             List[str]: Recent response texts, newest first
         """
-        responses = self.session_responses.get(session_id, [])
-        return responses[-count:] if responses else []
-
-    def _count_conversation_turns(self, session_id: str) -> int:
-        """Count total conversation turns in the session."""
-        behaviors = self.session_behaviors.get(session_id, [])
-        return len(behaviors) + 1  # +1 for current turn
+        responses = self.session_responses.get(session_id)
+        if not responses:
+            return []
+        return list(islice(responses, max(len(responses) - count, 0), None))
 
     def _calculate_clarification_frequency(self, response: str, total_turns: int) -> float:
         """
         Calculate frequency of clarification requests.
 
         Args:
-            response: Agent response text
+            response: Lowercased agent response text
             total_turns: Total conversation turns
 
         Returns:
             float: Clarification frequency (0.0 to 1.0)
         """
-        clarification_patterns = [
-            r'\b(could you|can you|please)\s+(clarify|explain|tell me more)',
-            r'\b(what do you mean|I don\'t understand|unclear)',
-            r'\?(.*?)\?',  # Questions ending with question marks
-            r'\b(help me understand|need more information)',
-        ]
+        if not any(literal in response for literal in CLARIFICATION_LITERALS):
+            return 0.0
 
-        clarification_count = 0
-        response_lower = response.lower()
-
-        for pattern in clarification_patterns:
-            matches = re.findall(pattern, response_lower)
-            clarification_count += len(matches)
+        clarification_count = sum(1 for _ in CLARIFICATION_RE.finditer(response))
 
         return min(clarification_count / max(total_turns, 1), 1.0)
 
@@ -192,15 +294,15 @@ class InteractionTracker:
         Returns:
             int: Number of topic switches detected (0 or 1 for single interaction)
         """
-        # Simple heuristic: if agent response is very short and doesn't contain
+        # Simple heuristic: if agent response is substantial but doesn't contain
         # key words from user message, it might be a topic switch
-        user_words = set(user_message.lower().split())
-        response_words = set(agent_response.lower().split())
+        response_tokens = agent_response.split()
+        if len(response_tokens) <= 10:
+            return 0  # Too short to count as a switch; skip the word-set work
 
-        # Remove common stop words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        user_words = user_words - stop_words
-        response_words = response_words - stop_words
+        # Common stop words are dropped while building the word sets
+        user_words = {w for w in user_message.lower().split() if w not in STOP_WORDS}
+        response_words = {w for w in map(str.lower, response_tokens) if w not in STOP_WORDS}
 
         if len(user_words) == 0:
             return 0
@@ -208,8 +310,8 @@ class InteractionTracker:
         overlap = len(user_words.intersection(response_words))
         overlap_ratio = overlap / len(user_words)
 
-        # If overlap is very low and response is substantial, might be topic switch
-        if overlap_ratio < 0.2 and len(agent_response.split()) > 10:
+        # If overlap is very low, might be topic switch
+        if overlap_ratio < 0.2:
             return 1
 
         return 0
@@ -219,35 +321,32 @@ class InteractionTracker:
         Count expressions of confidence/uncertainty in the response.
 
         Args:
-            response: Agent response text
+            response: Lowercased agent response text
 
         Returns:
             int: Number of confidence expressions
         """
-        confidence_patterns = [
-            r'\b(I think|I believe|I assume|probably|likely|maybe|perhaps)',
-            r'\b(definitely|certainly|absolutely|sure|confident)',
-            r'\b(not sure|uncertain|unclear|might be|could be)',
-            r'\b(in my opinion|from my perspective)',
-        ]
-
-        confidence_count = 0
-        response_lower = response.lower()
-
-        for pattern in confidence_patterns:
-            matches = re.findall(pattern, response_lower)
-            confidence_count += len(matches)
+        if not any(literal in response for literal in CONFIDENCE_LITERALS):
+            return 0
 
-        return confidence_count
+        return sum(1 for _ in CONFIDENCE_RE.finditer(response))
 
     def clear_session_data(self, session_id: str) -> None:
         """Clear behavioral data for a session."""
         if session_id in self.session_behaviors:
             del self.session_behaviors[session_id]
+        self.session_aggregates.pop(session_id, None)
         if session_id in self.session_responses:
             del self.session_responses[session_id]
         logger.info("Cleared behavioral data for session", session_id=session_id)
 
+    def _evict_least_recent_session(self) -> None:
+        """Drop all data for the least recently active session."""
+        session_id, _ = self.session_aggregates.popitem(last=False)
+        self.session_behaviors.pop(session_id, None)
+        self.session_responses.pop(session_id, None)
+        logger.info("Evicted least recently active session", session_id=session_id)
+
     def get_all_session_ids(self) -> List[str]:
         """Get all session IDs with tracked behavioral data."""
         return list(self.session_behaviors.keys())
\ No newline at end of file
@@ -6,19 +6,24 @@ and database persistence while keeping core behavioral logic classes pure.
 """
 
 import os
-from typing import Dict, Any, Optional
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 import structlog
 
 from ..models import AgentRequest, AgentResponse, InteractionBehavior
+from ..models import BehavioralBaseline as BaselineModel
 from ..metrics import MetricsCollector
-from ..database import AsyncSession, InteractionBehaviorLog, BehavioralAnomalyLog, BehavioralBaseline
-from .interaction_tracker import InteractionTracker
+from ..database import AsyncSession, BehavioralBaseline, behavior_writer, anomaly_writer
+from .interaction_tracker import InteractionTracker, MAX_SESSION_RESPONSES
 from .baseline_manager import BaselineManager
 from .temporal_analyzer import TemporalBehaviorAnalyzer
 from .anomaly_detector import AnomalyDetector
 
 logger = structlog.get_logger(__name__)
+_stdlib_logger = logging.getLogger(__name__)
 
 
 class BehavioralMonitoringService:
@@ -42,6 +47,10 @@ class BehavioralMonitoringService:
         self.metrics_collector = metrics_collector
         self.db_session = db_session
 
+        # Behavior and anomaly logs are inserted in batches by background writers
+        self.behavior_writer = behavior_writer
+        self.anomaly_writer = anomaly_writer
+
         # Initialize pure behavioral logic components
         self.interaction_tracker = InteractionTracker()
         self.baseline_manager = BaselineManager()
@@ -51,6 +60,10 @@ class BehavioralMonitoringService:
             temporal_analyzer=self.temporal_analyzer
         )
 
+        # Guards all tracker and baseline manager state. The async pipeline only takes
+        # it inside worker threads (asyncio.to_thread), so the event loop never blocks on it
+        self._analysis_lock = threading.Lock()
+
         # Configuration from environment
         self.metrics_enabled = os.getenv('BEHAVIORAL_METRICS_ENABLED', 'true').lower() == 'true'
         self.db_persistence_enabled = os.getenv('BEHAVIORAL_DB_PERSISTENCE_ENABLED', 'true').lower() == 'true'
@@ -59,7 +72,8 @@ class BehavioralMonitoringService:
                                 session_id: str,
                                 request: AgentRequest,
                                 response: AgentResponse,
-                                start_time: float) -> Dict[str, Any]:
+                                start_time: int,
+                                include_session_metrics: bool = False) -> Dict[str, Any]:
         """
         Complete behavioral monitoring pipeline for a single interaction.
 
@@ -67,56 +81,104 @@ class BehavioralMonitoringService:
             session_id: Session identifier
             request: Agent request
             response: Agent response
-            start_time: When processing started
+            start_time: When processing started (time.monotonic_ns())
+            include_session_metrics: Also return the aggregated session metrics
 
         Returns:
             Dict containing behavioral analysis results
         """
         try:
-            # 1. Track interaction behavior (pure logic)
-            behavior = self.interaction_tracker.track_interaction(
-                session_id, request, response, start_time
-            )
-
-            # 2. Get session history for anomaly detection
-            session_behaviors = self.interaction_tracker.get_recent_behaviors(session_id)
-            recent_responses = self.interaction_tracker.get_recent_responses(session_id)
+            persist = self.db_persistence_enabled and self.db_session is not None
 
-            # 3. Detect anomalies (pure logic)
-            anomaly_results = self.anomaly_detector.detect_anomalies(
-                session_id, behavior, session_behaviors, recent_responses
+            # 1-3. Track behavior, detect anomalies and refresh the baseline (pure logic,
+            # off the event loop)
+            behavior, anomaly_results, session_metrics, baseline_update = await asyncio.to_thread(
+                self._analyze_interaction, session_id, request, response, start_time,
+                include_session_metrics, persist
             )
 
             # 4. Infrastructure concerns (metrics & persistence)
             if self.metrics_enabled and self.metrics_collector:
                 await self._record_metrics(behavior, anomaly_results)
 
-            if self.db_persistence_enabled and self.db_session:
-                await self._persist_data(behavior, anomaly_results)
+            if persist:
+                await self._persist_data(behavior, anomaly_results, baseline_update)
 
             # 5. Return comprehensive results
-            return {
+            results = {
                 "behavior": behavior.model_dump(),
                 "anomaly_results": anomaly_results,
-                "session_metrics": self.interaction_tracker.get_session_metrics(session_id),
                 "monitoring_metadata": {
                     "metrics_recorded": self.metrics_enabled and self.metrics_collector is not None,
                     "data_persisted": self.db_persistence_enabled and self.db_session is not None,
-                    "processing_timestamp": datetime.now().isoformat()
+                    "processing_timestamp": anomaly_results["timestamp"]  # Formatted by whoever serializes it
                 }
             }
+            if include_session_metrics:
+                results["session_metrics"] = session_metrics
+            return results
 
         except Exception as e:
             logger.error("Behavioral monitoring failed",
                         session_id=session_id,
                         error=str(e))
-            # Return minimal safe response
-            return {
+            # Return minimal safe response, shaped like the success path
+            results = {
                 "behavior": None,
                 "anomaly_results": {"anomalies_detected": [], "overall_anomaly_score": 0.0},
-                "session_metrics": {},
                 "monitoring_metadata": {"error": str(e)}
             }
+            if include_session_metrics:
+                results["session_metrics"] = {}
+            return results
+
+    def _analyze_interaction(self,
+                             session_id: str,
+                             request: AgentRequest,
+                             response: AgentResponse,
+                             start_time: int,
+                             include_session_metrics: bool = False,
+                             refresh_baseline: bool = False
+                             ) -> Tuple[InteractionBehavior, Dict[str, Any], Optional[Dict[str, Any]],
+                                        Optional[Tuple[BaselineModel, int]]]:
+        """
+        Track the interaction and run anomaly detection on the session history.
+
+        Runs in a worker thread; every read and write of tracker and baseline state
+        happens here under the analysis lock.
+
+        Returns:
+            Tuple of (behavior, anomaly results, session metrics if requested,
+            (baseline, interaction count) if a baseline was refreshed)
+        """
+        with self._analysis_lock:
+            # 1. Track interaction behavior
+            behavior = self.interaction_tracker.track_interaction(
+                session_id, request, response, start_time
+            )
+
+            # 2. Get session history for anomaly detection
+            session_behaviors = self.interaction_tracker.get_recent_behaviors(session_id)
+            # Every retained response, so loop cycles up to half that length are visible
+            recent_responses = self.interaction_tracker.get_recent_responses(session_id, MAX_SESSION_RESPONSES)
+
+            # 3. Detect anomalies
+            anomaly_results = self.anomaly_detector.detect_anomalies(
+                session_id, behavior, session_behaviors, recent_responses
+            )
+
+            session_metrics = (
+                self.interaction_tracker.get_session_metrics(session_id) if include_session_metrics else None
+            )
+
+            # Refresh the baseline that gets persisted
+            baseline_update = None
+            if refresh_baseline and len(session_behaviors) >= self.baseline_manager.min_interactions:
+                baseline = self.baseline_manager.establish_baseline(session_id, session_behaviors)
+                if baseline:
+                    baseline_update = (baseline, len(session_behaviors))
+
+        return behavior, anomaly_results, session_metrics, baseline_update
 
     async def _record_metrics(self, behavior: InteractionBehavior, anomaly_results: Dict[str, Any]) -> None:
         """Record behavioral metrics to Prometheus using existing MetricsCollector."""
@@ -166,20 +228,24 @@ class BehavioralMonitoringService:
                         drift_type = anomaly.get("details", {}).get("drift_type", "unknown")
                         self.metrics_collector.record_behavioral_drift(drift_type, anomaly["score"], 1)
 
-            logger.debug("Recorded behavioral metrics",
-                        session_id=behavior.session_id,
-                        anomaly_count=len(anomaly_results["anomalies_detected"]))
+            if _stdlib_logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Recorded behavioral metrics",
+                            session_id=behavior.session_id,
+                            anomaly_count=len(anomaly_results["anomalies_detected"]))
 
         except Exception as e:
             logger.warning("Failed to record behavioral metrics",
                           session_id=behavior.session_id,
                           error=str(e))
 
-    async def _persist_data(self, behavior: InteractionBehavior, anomaly_results: Dict[str, Any]) -> None:
+    async def _persist_data(self,
+                            behavior: InteractionBehavior,
+                            anomaly_results: Dict[str, Any],
+                            baseline_update: Optional[Tuple[BaselineModel, int]] = None) -> None:
         """Persist behavioral data using existing database.py infrastructure."""
         try:
-            # Persist interaction behavior using existing InteractionBehaviorLog model
-            behavior_record = InteractionBehaviorLog(
+            # Queue interaction behavior as an InteractionBehaviorLog row
+            self.behavior_writer.enqueue(dict(
                 session_id=behavior.session_id,
                 timestamp=behavior.timestamp,
                 response_latency_ms=behavior.response_latency_ms,
@@ -190,18 +256,17 @@ class BehavioralMonitoringService:
                 confidence_expressions=behavior.confidence_expressions,
                 # Store anomaly score if available
                 anomaly_score=float(anomaly_results["overall_anomaly_score"]) if anomaly_results["overall_anomaly_score"] else None,
-                metadata={
+                interaction_metadata={
                     'tracked_at': behavior.timestamp.isoformat(),
                     'service_version': '1.0',
                     'monitoring_service': 'BehavioralMonitoringService'
                 }
-            )
-            self.db_session.add(behavior_record)
+            ))
 
-            # Persist anomalies using existing BehavioralAnomalyLog model
+            # Queue anomalies as BehavioralAnomalyLog rows
             if anomaly_results["anomalies_detected"]:
                 for anomaly in anomaly_results["anomalies_detected"]:
-                    anomaly_record = BehavioralAnomalyLog(
+                    self.anomaly_writer.enqueue(dict(
                         session_id=behavior.session_id,
                         timestamp=anomaly_results["timestamp"],
                         anomaly_type=anomaly["type"],
@@ -211,59 +276,57 @@ class BehavioralMonitoringService:
                         contributing_factors=anomaly.get("details", {}),
                         recommendations=anomaly_results["recommendations"],
                         resolved=False  # Will be updated by ops team
-                    )
-                    self.db_session.add(anomaly_record)
+                    ))
 
             # Persist/update baseline using existing BehavioralBaseline model
-            await self._update_baseline_if_needed(behavior)
+            if baseline_update:
+                await self._persist_baseline(*baseline_update)
 
-            logger.debug("Queued behavioral data for database persistence",
-                        session_id=behavior.session_id,
-                        anomaly_count=len(anomaly_results["anomalies_detected"]))
+            if _stdlib_logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Queued behavioral data for database persistence",
+                            session_id=behavior.session_id,
+                            anomaly_count=len(anomaly_results["anomalies_detected"]))
 
         except Exception as e:
             logger.warning("Failed to persist behavioral data",
                           session_id=behavior.session_id,
                           error=str(e))
 
-    async def _update_baseline_if_needed(self, behavior: InteractionBehavior) -> None:
-        """Update behavioral baseline using existing BehavioralBaseline model."""
+    async def _persist_baseline(self, baseline: BaselineModel, interaction_count: int) -> None:
+        """Upsert a refreshed baseline using existing BehavioralBaseline model."""
         try:
-            session_behaviors = self.interaction_tracker.get_recent_behaviors(behavior.session_id)
-
-            # Check if we should establish/update baseline
-            if len(session_behaviors) >= self.baseline_manager.min_interactions:
-                baseline = self.baseline_manager.establish_baseline(
-                    behavior.session_id, session_behaviors
-                )
-
-                if baseline:
-                    # Use existing BehavioralBaseline model structure
-                    db_baseline = BehavioralBaseline(
-                        session_id=baseline.session_id,
-                        avg_response_latency=float(baseline.avg_response_latency),
-                        typical_message_length_min=baseline.typical_message_length_range[0],
-                        typical_message_length_max=baseline.typical_message_length_range[1],
-                        normal_clarification_rate=float(baseline.normal_clarification_rate),
-                        standard_conversation_depth=baseline.standard_conversation_depth,
-                        confidence_pattern=baseline.confidence_pattern,
-                        interaction_count=len(session_behaviors)
-                    )
+            # Use existing BehavioralBaseline model structure
+            db_baseline = BehavioralBaseline(
+                session_id=baseline.session_id,
+                avg_response_latency=float(baseline.avg_response_latency),
+                typical_message_length_min=baseline.typical_message_length_range[0],
+                typical_message_length_max=baseline.typical_message_length_range[1],
+                normal_clarification_rate=float(baseline.normal_clarification_rate),
+                standard_conversation_depth=baseline.standard_conversation_depth,
+                confidence_pattern=baseline.confidence_pattern,
+                interaction_count=interaction_count
+            )
 
-                    # Upsert baseline (update if exists, insert if not)
-                    self.db_session.merge(db_baseline)
+            # Upsert baseline (update if exists, insert if not)
+            await self.db_session.merge(db_baseline)
 
         except Exception as e:
             logger.warning("Failed to update baseline",
-                          session_id=behavior.session_id,
+                          session_id=baseline.session_id,
                           error=str(e))
 
     def get_session_analysis(self, session_id: str) -> Dict[str, Any]:
-        """Get comprehensive behavioral analysis for a session."""
+        """
+        Get comprehensive behavioral analysis for a session.
+
+        Takes the analysis lock, so it waits for a running analysis; from async code
+        call it through asyncio.to_thread rather than on the event loop.
+        """
         try:
-            session_metrics = self.interaction_tracker.get_session_metrics(session_id)
-            recent_behaviors = self.interaction_tracker.get_recent_behaviors(session_id)
-            baseline = self.baseline_manager.get_baseline(session_id)
+            with self._analysis_lock:
+                session_metrics = self.interaction_tracker.get_session_metrics(session_id)
+                recent_behaviors = self.interaction_tracker.get_recent_behaviors(session_id)
+                baseline = self.baseline_manager.get_baseline(session_id)
 
             return {
                 "session_id": session_id,
@@ -279,8 +342,13 @@ class BehavioralMonitoringService:
             return {"error": str(e)}
 
     def clear_session_data(self, session_id: str) -> None:
-        """Clear in-memory behavioral data for a session (database data persists)."""
-        self.interaction_tracker.clear_session_data(session_id)
+        """
+        Clear in-memory behavioral data for a session (database data persists).
+
+        Takes the analysis lock; from async code call it through asyncio.to_thread.
+        """
+        with self._analysis_lock:
+            self.interaction_tracker.clear_session_data(session_id)
         # Note: Database data persists according to retention policies
 
     def get_monitoring_status(self) -> Dict[str, Any]:
@@ -289,7 +357,8 @@ class BehavioralMonitoringService:
             "service_active": True,
             "metrics_enabled": self.metrics_enabled,
             "db_persistence_enabled": self.db_persistence_enabled,
-            "tracked_sessions": len(self.interaction_tracker.get_all_session_ids()),
+            # len() of a dict is a single atomic read, safe while a worker mutates it
+            "tracked_sessions": len(self.interaction_tracker.session_behaviors),
             "baseline_count": len(self.baseline_manager.baselines),
             "configuration": {
                 "min_interactions_for_baseline": self.baseline_manager.min_interactions,
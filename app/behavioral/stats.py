@@ -0,0 +1,20 @@
+"""
+Shared statistics helpers for the behavioral analysis components.
+"""
+
+from typing import Sequence, Tuple
+
+
+def welford_update(
+    count: float,
+    mean: float,
+    m2: float,
+    values: Sequence[float]
+) -> Tuple[float, float, float]:
+    """Fold values into running (count, mean, M2) statistics using Welford's algorithm."""
+    for value in values:
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+    return count, mean, m2
@@ -5,15 +5,51 @@ This module analyzes behavioral patterns over time to detect gradual shifts
 and changes in agent interaction patterns.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+from bisect import bisect_left, bisect_right
+from collections import Counter
 from datetime import datetime, timedelta
-import statistics
+from itertools import pairwise
+from math import fsum, sqrt
+from operator import attrgetter
 import structlog
 
 from ..models import InteractionBehavior, ConversationFlowMetrics, DriftScore, PatternAnalysis
+from .stats import welford_update
 
 logger = structlog.get_logger(__name__)
 
+# Message length ranges: under 50 chars is short, under 200 medium, otherwise long
+LENGTH_RANGE_BOUNDS = (50, 200)
+LENGTH_RANGE_LABELS = ("short", "medium", "long")
+
+# Latency, length, clarification and confidence of one behavior, read in a single C-level call
+_metric_values = attrgetter(
+    "response_latency_ms", "message_length", "clarification_frequency", "confidence_expressions"
+)
+
+
+def _mean(values: Iterable[float], count: int) -> float:
+    """Arithmetic mean of count values, summed with fsum."""
+    return fsum(values) / count
+
+
+def _metric_means(behaviors: List[InteractionBehavior]) -> Tuple[float, float, float, float]:
+    """Mean latency, length, clarification and confidence, summed in a single pass."""
+    latency = length = clarification = confidence = 0
+    for latency_ms, message_length, clarification_rate, confidence_count in map(_metric_values, behaviors):
+        latency += latency_ms
+        length += message_length
+        clarification += clarification_rate
+        confidence += confidence_count
+    count = len(behaviors)
+    return latency / count, length / count, clarification / count, confidence / count
+
+
+def _metric_columns(behaviors: List[InteractionBehavior]) -> Tuple[Tuple[float, ...], ...]:
+    """Latency, length, clarification and confidence columns, extracted in one pass."""
+    return tuple(zip(*map(_metric_values, behaviors)))
+
 
 class TemporalBehaviorAnalyzer:
     """Analyzes behavioral patterns over time windows."""
@@ -42,21 +78,22 @@ class TemporalBehaviorAnalyzer:
             )
 
         session_id = behaviors[0].session_id
+        latencies, lengths, clarifications, _ = _metric_columns(behaviors)
 
         # Calculate flow consistency (how consistent response patterns are)
-        flow_consistency_score = self._calculate_flow_consistency(behaviors)
+        flow_consistency_score = self._calculate_flow_consistency(latencies, lengths)
 
         # Calculate topic coherence (how well topics are maintained)
         topic_coherence_score = self._calculate_topic_coherence(behaviors)
 
         # Calculate engagement level
-        engagement_level = self._calculate_engagement_level(behaviors)
+        engagement_level = self._calculate_engagement_level(lengths, clarifications)
 
         # Analyze turn-taking patterns
         turn_taking_pattern = self._analyze_turn_taking(behaviors)
 
         # Calculate response rhythm score
-        response_rhythm_score = self._calculate_response_rhythm(behaviors)
+        response_rhythm_score = self._calculate_response_rhythm(latencies)
 
         return ConversationFlowMetrics(
             session_id=session_id,
@@ -76,12 +113,15 @@ class TemporalBehaviorAnalyzer:
         Detect behavioral drift over a time window.
 
         Args:
-            behaviors: List of interaction behaviors
+            behaviors: Interaction behaviors in chronological order (oldest first), as
+                InteractionTracker.get_recent_behaviors returns them
             time_window_hours: Time window for drift analysis
 
         Returns:
             DriftScore: Drift detection results
         """
+        now = datetime.now()
+
         if len(behaviors) < 4:  # Need minimum data for drift detection
             return DriftScore(
                 session_id=behaviors[0].session_id if behaviors else "",
@@ -89,15 +129,16 @@ class TemporalBehaviorAnalyzer:
                 drift_type="insufficient_data",
                 time_window_hours=time_window_hours,
                 confidence=0.0,
-                detected_at=datetime.now(),
+                detected_at=now,
                 contributing_factors=["Insufficient data for drift analysis"]
             )
 
         session_id = behaviors[0].session_id
 
-        # Filter behaviors within time window
-        cutoff_time = datetime.now() - timedelta(hours=time_window_hours)
-        recent_behaviors = [b for b in behaviors if b.timestamp >= cutoff_time]
+        # Filter behaviors within time window; the history is chronological, so the
+        # window is a suffix found by binary search
+        cutoff_time = now - timedelta(hours=time_window_hours)
+        recent_behaviors = behaviors[bisect_left(behaviors, cutoff_time, key=attrgetter("timestamp")):]
 
         if len(recent_behaviors) < 2:
             return DriftScore(
@@ -106,7 +147,7 @@ class TemporalBehaviorAnalyzer:
                 drift_type="insufficient_recent_data",
                 time_window_hours=time_window_hours,
                 confidence=0.0,
-                detected_at=datetime.now(),
+                detected_at=now,
                 contributing_factors=["Insufficient recent data"]
             )
 
@@ -115,15 +156,17 @@ class TemporalBehaviorAnalyzer:
         early_behaviors = recent_behaviors[:mid_point]
         late_behaviors = recent_behaviors[mid_point:]
 
-        # Calculate drift in different dimensions
-        latency_drift = self._calculate_latency_drift(early_behaviors, late_behaviors)
-        length_drift = self._calculate_length_drift(early_behaviors, late_behaviors)
-        clarification_drift = self._calculate_clarification_drift(early_behaviors, late_behaviors)
-        confidence_drift = self._calculate_confidence_drift(early_behaviors, late_behaviors)
+        # Calculate drift in different dimensions; each period is summed in one pass
+        early_latency, early_length, early_clarification, early_confidence = _metric_means(early_behaviors)
+        late_latency, late_length, late_clarification, late_confidence = _metric_means(late_behaviors)
+        latency_drift = self._calculate_latency_drift(early_latency, late_latency)
+        length_drift = self._calculate_length_drift(early_length, late_length)
+        clarification_drift = self._calculate_clarification_drift(early_clarification, late_clarification)
+        confidence_drift = self._calculate_confidence_drift(early_confidence, late_confidence)
 
         # Overall drift score
         drift_components = [latency_drift, length_drift, clarification_drift, confidence_drift]
-        overall_drift = statistics.mean(drift_components)
+        overall_drift = _mean(drift_components, len(drift_components))
 
         # Determine drift type and contributing factors
         drift_type, contributing_factors = self._analyze_drift_components(
@@ -139,7 +182,7 @@ class TemporalBehaviorAnalyzer:
             drift_type=drift_type,
             time_window_hours=time_window_hours,
             confidence=confidence,
-            detected_at=datetime.now(),
+            detected_at=now,
             contributing_factors=contributing_factors
         )
 
@@ -159,19 +202,20 @@ class TemporalBehaviorAnalyzer:
             return patterns
 
         session_id = behaviors[0].session_id
+        _, lengths, clarifications, confidences = _metric_columns(behaviors)
 
         # Identify repetitive response length patterns
-        length_pattern = self._identify_length_patterns(behaviors)
+        length_pattern = self._identify_length_patterns(behaviors, lengths)
         if length_pattern:
             patterns.append(length_pattern)
 
         # Identify clarification request patterns
-        clarification_pattern = self._identify_clarification_patterns(behaviors)
+        clarification_pattern = self._identify_clarification_patterns(behaviors, clarifications)
         if clarification_pattern:
             patterns.append(clarification_pattern)
 
         # Identify confidence expression patterns
-        confidence_pattern = self._identify_confidence_patterns(behaviors)
+        confidence_pattern = self._identify_confidence_patterns(behaviors, confidences)
         if confidence_pattern:
             patterns.append(confidence_pattern)
 
@@ -190,39 +234,27 @@ class TemporalBehaviorAnalyzer:
         if len(behaviors) < 2:
             return 1.0
 
-        # Calculate variance in different dimensions
-        latencies = [b.response_latency_ms for b in behaviors]
-        lengths = [b.message_length for b in behaviors]
-        clarifications = [b.clarification_frequency for b in behaviors]
-        confidences = [b.confidence_expressions for b in behaviors]
-
-        # Calculate coefficient of variation for each dimension
-        latency_cv = self._coefficient_of_variation(latencies)
-        length_cv = self._coefficient_of_variation(lengths)
-        clarification_cv = self._coefficient_of_variation(clarifications)
-        confidence_cv = self._coefficient_of_variation(confidences)
+        # Calculate coefficient of variation for each dimension (latency, length,
+        # clarification, confidence), all columns extracted in one pass
+        cvs = map(self._coefficient_of_variation, _metric_columns(behaviors))
 
         # Convert CV to consistency score (lower CV = higher consistency)
-        consistency_scores = []
-        for cv in [latency_cv, length_cv, clarification_cv, confidence_cv]:
-            consistency_scores.append(max(0.0, 1.0 - cv))
+        consistency_scores = [max(0.0, 1.0 - cv) for cv in cvs]
 
-        return statistics.mean(consistency_scores)
+        return _mean(consistency_scores, len(consistency_scores))
 
-    def _calculate_flow_consistency(self, behaviors: List[InteractionBehavior]) -> float:
+    def _calculate_flow_consistency(self, latencies: Sequence[int], lengths: Sequence[int]) -> float:
         """Calculate how consistent the conversation flow is."""
-        if len(behaviors) < 2:
+        if len(latencies) < 2:
             return 1.0
 
         # Analyze response time consistency
-        latencies = [b.response_latency_ms for b in behaviors]
         latency_consistency = 1.0 - self._coefficient_of_variation(latencies)
 
         # Analyze message length consistency
-        lengths = [b.message_length for b in behaviors]
         length_consistency = 1.0 - self._coefficient_of_variation(lengths)
 
-        return statistics.mean([latency_consistency, length_consistency])
+        return (latency_consistency + length_consistency) / 2
 
     def _calculate_topic_coherence(self, behaviors: List[InteractionBehavior]) -> float:
         """Calculate topic coherence based on topic switches."""
@@ -238,65 +270,52 @@ class TemporalBehaviorAnalyzer:
 
         return coherence_score
 
-    def _calculate_engagement_level(self, behaviors: List[InteractionBehavior]) -> float:
+    def _calculate_engagement_level(self, lengths: Sequence[int], clarifications: Sequence[float]) -> float:
         """Calculate engagement level based on various metrics."""
-        if not behaviors:
+        if not lengths:
             return 0.0
 
         # Longer messages generally indicate higher engagement
-        avg_length = statistics.mean([b.message_length for b in behaviors])
+        avg_length = _mean(lengths, len(lengths))
         length_score = min(avg_length / 200.0, 1.0)  # Normalize to 200 chars = full score
 
         # Lower clarification frequency = better engagement
-        avg_clarification = statistics.mean([b.clarification_frequency for b in behaviors])
+        avg_clarification = _mean(clarifications, len(clarifications))
         clarification_score = max(0.0, 1.0 - avg_clarification)
 
-        return statistics.mean([length_score, clarification_score])
+        return (length_score + clarification_score) / 2
 
     def _analyze_turn_taking(self, behaviors: List[InteractionBehavior]) -> List[int]:
         """Analyze turn-taking patterns."""
         return [b.conversation_turns for b in behaviors]
 
-    def _calculate_response_rhythm(self, behaviors: List[InteractionBehavior]) -> float:
+    def _calculate_response_rhythm(self, latencies: Sequence[int]) -> float:
         """Calculate response rhythm consistency."""
-        if len(behaviors) < 2:
+        if len(latencies) < 2:
             return 1.0
 
-        latencies = [b.response_latency_ms for b in behaviors]
         return 1.0 - self._coefficient_of_variation(latencies)
 
-    def _calculate_latency_drift(self, early: List[InteractionBehavior], late: List[InteractionBehavior]) -> float:
-        """Calculate drift in response latency."""
-        early_avg = statistics.mean([b.response_latency_ms for b in early])
-        late_avg = statistics.mean([b.response_latency_ms for b in late])
-
+    def _calculate_latency_drift(self, early_avg: float, late_avg: float) -> float:
+        """Calculate drift in response latency from the early and late period means."""
         if early_avg == 0:
             return 0.0
 
         return abs(late_avg - early_avg) / early_avg
 
-    def _calculate_length_drift(self, early: List[InteractionBehavior], late: List[InteractionBehavior]) -> float:
-        """Calculate drift in message length."""
-        early_avg = statistics.mean([b.message_length for b in early])
-        late_avg = statistics.mean([b.message_length for b in late])
-
+    def _calculate_length_drift(self, early_avg: float, late_avg: float) -> float:
+        """Calculate drift in message length from the early and late period means."""
         if early_avg == 0:
             return 0.0
 
         return abs(late_avg - early_avg) / early_avg
 
-    def _calculate_clarification_drift(self, early: List[InteractionBehavior], late: List[InteractionBehavior]) -> float:
-        """Calculate drift in clarification frequency."""
-        early_avg = statistics.mean([b.clarification_frequency for b in early])
-        late_avg = statistics.mean([b.clarification_frequency for b in late])
-
+    def _calculate_clarification_drift(self, early_avg: float, late_avg: float) -> float:
+        """Calculate drift in clarification frequency from the early and late period means."""
         return abs(late_avg - early_avg)
 
-    def _calculate_confidence_drift(self, early: List[InteractionBehavior], late: List[InteractionBehavior]) -> float:
-        """Calculate drift in confidence expressions."""
-        early_avg = statistics.mean([b.confidence_expressions for b in early])
-        late_avg = statistics.mean([b.confidence_expressions for b in late])
-
+    def _calculate_confidence_drift(self, early_avg: float, late_avg: float) -> float:
+        """Calculate drift in confidence expressions from the early and late period means."""
         if early_avg == 0:
             return abs(late_avg - early_avg)
 
@@ -323,22 +342,17 @@ class TemporalBehaviorAnalyzer:
 
         return max_drift_type, contributing_factors
 
-    def _identify_length_patterns(self, behaviors: List[InteractionBehavior]) -> Optional[PatternAnalysis]:
+    def _identify_length_patterns(self,
+                                  behaviors: List[InteractionBehavior],
+                                  lengths: Sequence[int]) -> Optional[PatternAnalysis]:
         """Identify patterns in message length."""
-        lengths = [b.message_length for b in behaviors]
-
         # Simple pattern: check for repetitive length ranges
-        length_ranges = []
-        for length in lengths:
-            if length < 50:
-                length_ranges.append("short")
-            elif length < 200:
-                length_ranges.append("medium")
-            else:
-                length_ranges.append("long")
-
-        # Count consecutive occurrences
-        pattern_strength = self._calculate_pattern_strength(length_ranges)
+        range_counts = Counter(
+            LENGTH_RANGE_LABELS[bisect_right(LENGTH_RANGE_BOUNDS, length)] for length in lengths
+        )
+
+        # Count repeated occurrences
+        pattern_strength = self._pattern_strength_from_counts(range_counts)
 
         if pattern_strength > 0.6:
             return PatternAnalysis(
@@ -347,15 +361,15 @@ class TemporalBehaviorAnalyzer:
                 pattern_strength=pattern_strength,
                 repetition_count=len(behaviors),
                 last_occurrence=behaviors[-1].timestamp,
-                pattern_metadata={"length_distribution": length_ranges}
+                pattern_metadata={"length_distribution": dict(range_counts)}
             )
 
         return None
 
-    def _identify_clarification_patterns(self, behaviors: List[InteractionBehavior]) -> Optional[PatternAnalysis]:
+    def _identify_clarification_patterns(self,
+                                         behaviors: List[InteractionBehavior],
+                                         clarifications: Sequence[float]) -> Optional[PatternAnalysis]:
         """Identify patterns in clarification requests."""
-        clarifications = [b.clarification_frequency for b in behaviors]
-
         # Check for increasing clarification trend
         if len(clarifications) >= 3:
             trend_strength = self._calculate_trend_strength(clarifications)
@@ -371,10 +385,10 @@ class TemporalBehaviorAnalyzer:
 
         return None
 
-    def _identify_confidence_patterns(self, behaviors: List[InteractionBehavior]) -> Optional[PatternAnalysis]:
+    def _identify_confidence_patterns(self,
+                                      behaviors: List[InteractionBehavior],
+                                      confidences: Sequence[int]) -> Optional[PatternAnalysis]:
         """Identify patterns in confidence expressions."""
-        confidences = [b.confidence_expressions for b in behaviors]
-
         pattern_strength = self._calculate_pattern_strength([str(c) for c in confidences])
 
         if pattern_strength > 0.5:
@@ -384,21 +398,21 @@ class TemporalBehaviorAnalyzer:
                 pattern_strength=pattern_strength,
                 repetition_count=len(behaviors),
                 last_occurrence=behaviors[-1].timestamp,
-                pattern_metadata={"confidence_levels": confidences}
+                pattern_metadata={"confidence_levels": list(confidences)}
             )
 
         return None
 
-    def _coefficient_of_variation(self, values: List[float]) -> float:
-        """Calculate coefficient of variation."""
+    def _coefficient_of_variation(self, values: Sequence[float]) -> float:
+        """Calculate coefficient of variation (sample stdev over mean, in one pass)."""
         if not values or len(values) < 2:
             return 0.0
 
-        mean_val = statistics.mean(values)
+        count, mean_val, m2 = welford_update(0, 0.0, 0.0, values)
         if mean_val == 0:
             return 0.0
 
-        std_val = statistics.stdev(values)
+        std_val = sqrt(max(m2, 0.0) / (count - 1))
         return std_val / mean_val
 
     def _calculate_pattern_strength(self, sequence: List[str]) -> float:
@@ -406,42 +420,30 @@ class TemporalBehaviorAnalyzer:
         if len(sequence) < 2:
             return 0.0
 
-        # Simple pattern detection: count repeated subsequences
-        pattern_count = 0
-        total_comparisons = 0
+        return self._pattern_strength_from_counts(Counter(sequence))
 
-        for i in range(len(sequence) - 1):
-            for j in range(i + 1, len(sequence)):
-                if sequence[i] == sequence[j]:
-                    pattern_count += 1
-                total_comparisons += 1
-
-        if total_comparisons == 0:
+    def _pattern_strength_from_counts(self, counts: Counter) -> float:
+        """Calculate pattern strength from the occurrence count of each distinct value."""
+        total = counts.total()
+        if total < 2:
             return 0.0
 
+        # Share of unordered pairs holding equal values, counted per distinct value
+        pattern_count = sum(c * (c - 1) // 2 for c in counts.values())
+        total_comparisons = total * (total - 1) // 2
+
         return pattern_count / total_comparisons
 
-    def _calculate_trend_strength(self, values: List[float]) -> float:
+    def _calculate_trend_strength(self, values: Sequence[float]) -> float:
         """Calculate trend strength (positive for increasing, negative for decreasing)."""
         if len(values) < 2:
             return 0.0
 
-        # Simple linear trend calculation
-        increases = 0
-        decreases = 0
-        total_changes = 0
-
-        for i in range(1, len(values)):
-            if values[i] > values[i-1]:
-                increases += 1
-            elif values[i] < values[i-1]:
-                decreases += 1
-            total_changes += 1
-
-        if total_changes == 0:
-            return 0.0
+        # Simple linear trend calculation: +1 per increase, -1 per decrease, 0 when flat
+        net_direction = sum((current > previous) - (current < previous)
+                            for previous, current in pairwise(values))
 
-        trend_ratio = (increases - decreases) / total_changes
+        trend_ratio = net_direction / (len(values) - 1)
         return trend_ratio
 
     def detect_response_loops(self, recent_responses: List[str]) -> Optional[Dict[str, Any]]:
@@ -449,7 +451,8 @@ class TemporalBehaviorAnalyzer:
         Quick loop detection using exact text matching.
 
         Args:
-            recent_responses: List of recent response texts (newest first)
+            recent_responses: List of recent response texts (newest first); cycles
+                up to half its length are detected
 
         Returns:
             Dict: Loop detection results if loop found, None otherwise
@@ -481,14 +484,15 @@ class TemporalBehaviorAnalyzer:
                     "confidence": 1.0 - uniqueness_ratio
                 }
 
-        # Check for alternating pattern (A-B-A or similar) only if not low diversity
-        if len(recent_responses) >= 4:
-            last_four = recent_responses[-4:]
-            if last_four[0] == last_four[2] and last_four[1] == last_four[3]:
+        # Check for a cycle of period p (A-B-A-B, A-B-C-A-B-C, ...) only if not low diversity;
+        # the shortest period whose last two cycles match wins
+        for period in range(2, len(recent_responses) // 2 + 1):
+            cycle = recent_responses[-period:]
+            if cycle == recent_responses[-2 * period:-period]:
                 return {
-                    "loop_type": "alternating_pattern",
-                    "pattern_length": 2,
-                    "pattern_texts": [last_four[0][:50], last_four[1][:50]],
+                    "loop_type": "alternating_pattern" if period == 2 else "periodic_pattern",
+                    "pattern_length": period,
+                    "pattern_texts": [text[:50] for text in cycle],
                     "confidence": 0.9
                 }
 
@@ -1,13 +1,137 @@
 import random
-import time
 import asyncio
-from typing import Dict, Any, Optional, Tuple
+from bisect import bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple
 import structlog
 from .models import FailureMode, FailureType
 from .metrics import metrics_collector
 
 logger = structlog.get_logger(__name__)
 
+# Seconds after a probabilistic failure during which a session gets no new one
+FAILURE_COOLDOWN_SECONDS = 30
+
+_FAILURE_SCENARIOS = {
+    # Output Quality Failures
+    FailureMode.HALLUCINATION: {
+        "type": FailureType.OUTPUT_QUALITY,
+        "probability": 0.3,
+        "responses": (
+            "Our premium service includes quantum encryption and time-travel backup features.",
+            "According to the recent study by the Institute of Digital Wellness (which doesn't exist), 95% of users prefer this approach.",
+            "This feature was actually invented by Steve Jobs in 2025 during his posthumous innovation period.",
+            "The algorithm uses advanced AI trained on data from parallel universes to ensure accuracy."
+        )
+    },
+    FailureMode.INCORRECT_REASONING: {
+        "type": FailureType.OUTPUT_QUALITY,
+        "probability": 0.25,
+        "logic_errors": (
+            "Since you're having login issues, you should definitely delete your account and create a new one.",
+            "The best way to fix network connectivity is to increase your password complexity.",
+            "If the application is slow, try using it on a different day of the week.",
+            "This error occurs because your computer's time zone is incompatible with our servers."
+        )
+    },
+    FailureMode.OFF_TOPIC: {
+        "type": FailureType.OUTPUT_QUALITY,
+        "probability": 0.2,
+        "off_topic_responses": (
+            "That reminds me of a great recipe for chocolate chip cookies! Would you like me to share it?",
+            "Speaking of your technical issue, have you considered taking up meditation? It really helps with stress.",
+            "You know, the weather has been quite unpredictable lately. How's the weather where you are?",
+            "This is similar to my favorite movie plot. Have you seen The Matrix? It's all about questioning reality."
+        )
+    },
+    
+    # Behavioral Failures
+    FailureMode.INFINITE_LOOP: {
+        "type": FailureType.BEHAVIORAL,
+        "probability": 0.2,
+        "loop_responses": (
+            "Could you please clarify what you mean by that?",
+            "I need a bit more information to help you better.",
+            "Can you provide more details about your specific situation?",
+            "To better assist you, could you elaborate on your request?"
+        ),
+        "max_iterations": 3
+    },
+    FailureMode.REFUSING_PROGRESS: {
+        "type": FailureType.BEHAVIORAL,
+        "probability": 0.15,
+        "refusal_responses": (
+            "I'm not comfortable making assumptions about your specific use case.",
+            "This seems like it might require specialized knowledge that I don't possess.",
+            "I'd rather not guess at the solution - you should contact a human expert.",
+            "This is beyond my capabilities and I cannot provide useful assistance."
+        )
+    },
+
+    # Integration Failures
+    FailureMode.API_TIMEOUT: {
+        "type": FailureType.INTEGRATION,
+        "probability": 0.1,
+        "timeout_range": (5, 15),  # seconds
+        "error_message": "External API request timed out"
+    },
+    FailureMode.AUTH_ERROR: {
+        "type": FailureType.INTEGRATION,
+        "probability": 0.08,
+        "error_message": "Authentication failed: Invalid API key"
+    },
+    FailureMode.SERVICE_UNAVAILABLE: {
+        "type": FailureType.INTEGRATION,
+        "probability": 0.12,
+        "error_message": "Service temporarily unavailable: 503 Service Unavailable"
+    },
+
+    # Resource Failures
+    FailureMode.TOKEN_LIMIT: {
+        "type": FailureType.RESOURCE,
+        "probability": 0.05,
+        "token_threshold": 1000,
+        "error_message": "Token limit exceeded"
+    },
+    FailureMode.MEMORY_EXHAUSTION: {
+        "type": FailureType.RESOURCE,
+        "probability": 0.03,
+        "error_message": "Memory limit exceeded: Unable to process request"
+    },
+    FailureMode.RATE_LIMITING: {
+        "type": FailureType.RESOURCE,
+        "probability": 0.07,
+        "error_message": "Rate limit exceeded: Please try again later"
+    }
+}
+
+# Read-only views; every injector shares these instead of building its own copies
+FAILURE_SCENARIOS: Mapping[FailureMode, Mapping[str, Any]] = MappingProxyType({
+    mode: MappingProxyType(config) for mode, config in _FAILURE_SCENARIOS.items()
+})
+TYPE_BY_MODE: Mapping[FailureMode, FailureType] = MappingProxyType({
+    mode: config["type"] for mode, config in _FAILURE_SCENARIOS.items()
+})
+
+
+def _pick_response(pool: Tuple[str, ...]) -> str:
+    """Uniform pick from a response pool; power-of-two pools take a single getrandbits draw."""
+    size = len(pool)
+    if size and not size & (size - 1):
+        return pool[random.getrandbits(size.bit_length() - 1)]
+    return random.choice(pool)
+
+
+@dataclass(slots=True)
+class SessionFailureState:
+    """Per-session bookkeeping for probabilistic failure injection."""
+    failure_count: int = 0
+    cooldown_expiry: float = float("-inf")  # Event-loop clock time the cooldown ends
+    last_failure_mode: Optional[FailureMode] = None
+    clarification_requests: int = 0
+    message_count: int = 0
+
 
 class FailureInjector:
     def __init__(self, probabilistic_mode: bool = False, failure_rate_multiplier: float = 1.0):
@@ -21,105 +145,36 @@ class FailureInjector:
         self.probabilistic_mode = probabilistic_mode
         self.failure_rate_multiplier = failure_rate_multiplier
 
-        self.failure_scenarios = {
-            # Output Quality Failures
-            FailureMode.HALLUCINATION: {
-                "type": FailureType.OUTPUT_QUALITY,
-                "probability": 0.3,
-                "responses": [
-                    "Our premium service includes quantum encryption and time-travel backup features.",
-                    "According to the recent study by the Institute of Digital Wellness (which doesn't exist), 95% of users prefer this approach.",
-                    "This feature was actually invented by Steve Jobs in 2025 during his posthumous innovation period.",
-                    "The algorithm uses advanced AI trained on data from parallel universes to ensure accuracy."
-                ]
-            },
-            FailureMode.INCORRECT_REASONING: {
-                "type": FailureType.OUTPUT_QUALITY,
-                "probability": 0.25,
-                "logic_errors": [
-                    "Since you're having login issues, you should definitely delete your account and create a new one.",
-                    "The best way to fix network connectivity is to increase your password complexity.",
-                    "If the application is slow, try using it on a different day of the week.",
-                    "This error occurs because your computer's time zone is incompatible with our servers."
-                ]
-            },
-            FailureMode.OFF_TOPIC: {
-                "type": FailureType.OUTPUT_QUALITY,
-                "probability": 0.2,
-                "off_topic_responses": [
-                    "That reminds me of a great recipe for chocolate chip cookies! Would you like me to share it?",
-                    "Speaking of your technical issue, have you considered taking up meditation? It really helps with stress.",
-                    "You know, the weather has been quite unpredictable lately. How's the weather where you are?",
-                    "This is similar to my favorite movie plot. Have you seen The Matrix? It's all about questioning reality."
-                ]
-            },
-            
-            # Behavioral Failures
-            FailureMode.INFINITE_LOOP: {
-                "type": FailureType.BEHAVIORAL,
-                "probability": 0.2,
-                "loop_responses": [
-                    "Could you please clarify what you mean by that?",
-                    "I need a bit more information to help you better.",
-                    "Can you provide more details about your specific situation?",
-                    "To better assist you, could you elaborate on your request?"
-                ],
-                "max_iterations": 3
-            },
-            FailureMode.REFUSING_PROGRESS: {
-                "type": FailureType.BEHAVIORAL,
-                "probability": 0.15,
-                "refusal_responses": [
-                    "I'm not comfortable making assumptions about your specific use case.",
-                    "This seems like it might require specialized knowledge that I don't possess.",
-                    "I'd rather not guess at the solution - you should contact a human expert.",
-                    "This is beyond my capabilities and I cannot provide useful assistance."
-                ]
-            },
-
-            # Integration Failures
-            FailureMode.API_TIMEOUT: {
-                "type": FailureType.INTEGRATION,
-                "probability": 0.1,
-                "timeout_range": (5, 15),  # seconds
-                "error_message": "External API request timed out"
-            },
-            FailureMode.AUTH_ERROR: {
-                "type": FailureType.INTEGRATION,
-                "probability": 0.08,
-                "error_message": "Authentication failed: Invalid API key"
-            },
-            FailureMode.SERVICE_UNAVAILABLE: {
-                "type": FailureType.INTEGRATION,
-                "probability": 0.12,
-                "error_message": "Service temporarily unavailable: 503 Service Unavailable"
-            },
-
-            # Resource Failures
-            FailureMode.TOKEN_LIMIT: {
-                "type": FailureType.RESOURCE,
-                "probability": 0.05,
-                "token_threshold": 1000,
-                "error_message": "Token limit exceeded"
-            },
-            FailureMode.MEMORY_EXHAUSTION: {
-                "type": FailureType.RESOURCE,
-                "probability": 0.03,
-                "error_message": "Memory limit exceeded: Unable to process request"
-            },
-            FailureMode.RATE_LIMITING: {
-                "type": FailureType.RESOURCE,
-                "probability": 0.07,
-                "error_message": "Rate limit exceeded: Please try again later"
-            }
+        # Scenario config is shared, read-only module data
+        self.failure_scenarios = FAILURE_SCENARIOS
+
+        # Precomputed dispatch tables so callers skip per-turn scenario lookups and type branching
+        self.type_by_mode = TYPE_BY_MODE
+        # Uniform (session_id, failure_mode, message, response_text, token_count) entry point per type
+        self.injector_by_type = {
+            FailureType.OUTPUT_QUALITY: lambda session_id, mode, message, response_text, token_count:
+                self.inject_output_quality_failure(session_id, mode, response_text),
+            FailureType.BEHAVIORAL: lambda session_id, mode, message, response_text, token_count:
+                self.inject_behavioral_failure(session_id, mode, message),
+            FailureType.INTEGRATION: lambda session_id, mode, message, response_text, token_count:
+                self.inject_integration_failure(session_id, mode),
+            FailureType.RESOURCE: lambda session_id, mode, message, response_text, token_count:
+                self.inject_resource_failure(session_id, mode, token_count),
         }
-        
-        self.session_states = {}
+
+        # Probabilistic selection tables keyed by (looping, last failure mode), built on first use
+        self.modes = list(self.failure_scenarios)
+        self._selection_tables: Dict[Tuple[bool, Optional[FailureMode]], Tuple[List[float], List[float]]] = {}
+
+        self.session_states: Dict[str, SessionFailureState] = {}
     
-    async def should_inject_failure(self, session_id: str, message: str, failure_mode: Optional[FailureMode] = None) -> Tuple[bool, Optional[FailureMode]]:
+    def should_inject_failure(self, session_id: str, message: str, failure_mode: Optional[FailureMode] = None) -> Tuple[bool, Optional[FailureMode]]:
         """
         Determine whether to inject a failure.
 
+        Synchronous, so the common no-failure case costs a plain call rather than a
+        coroutine; must be called from within the running event loop.
+
         Args:
             session_id: Session identifier
             message: User message
@@ -128,6 +183,10 @@ class FailureInjector:
         Returns:
             Tuple of (should_inject, failure_mode_to_inject)
         """
+        # Fast path: failures disabled and none forced
+        if failure_mode is None and not self.probabilistic_mode:
+            return False, None
+
         # Case 1: Forced failure mode (maintains backward compatibility)
         if failure_mode:
             logger.info("Forced failure mode activated", session_id=session_id, failure_mode=failure_mode)
@@ -135,69 +194,96 @@ class FailureInjector:
 
         # Case 2: Probabilistic failure injection
         if self.probabilistic_mode:
-            return await self._evaluate_probabilistic_failure(session_id, message)
+            return self._evaluate_probabilistic_failure(session_id, message)
 
         # Case 3: Default behavior - no failures
         return False, None
 
-    async def _evaluate_probabilistic_failure(self, session_id: str, message: str) -> Tuple[bool, Optional[FailureMode]]:
+    def _evaluate_probabilistic_failure(self, session_id: str, message: str) -> Tuple[bool, Optional[FailureMode]]:
         """
         Evaluate whether to inject a failure based on probabilities and session state.
+
+        Kept synchronous: the session state read-modify-write cannot interleave with
+        another coroutine for the same session, so no per-session lock is needed.
+        Must be called from within the running event loop.
         """
         # Initialize session state if not exists
-        if session_id not in self.session_states:
-            self.session_states[session_id] = {
-                "failure_count": 0,
-                "last_failure_time": None,
-                "last_failure_mode": None,
-                "clarification_requests": 0,
-                "message_count": 0
-            }
-
-        session_state = self.session_states[session_id]
-        session_state["message_count"] += 1
-
-        # Apply cooldown to prevent failure spam
-        current_time = time.time()
-        if session_state["last_failure_time"]:
-            time_since_last_failure = current_time - session_state["last_failure_time"]
-            if time_since_last_failure < 30:  # 30 second cooldown
-                logger.debug("Failure cooldown active", session_id=session_id,
-                           cooldown_remaining=30-time_since_last_failure)
-                return False, None
-
-        # Check each failure mode's probability
+        session_state = self.session_states.get(session_id)
+        if session_state is None:
+            session_state = self.session_states[session_id] = SessionFailureState()
+
+        session_state.message_count += 1
+
+        # Apply cooldown to prevent failure spam (monotonic event-loop clock)
+        current_time = asyncio.get_running_loop().time()
+        if current_time < session_state.cooldown_expiry:
+            logger.debug("Failure cooldown active", session_id=session_id,
+                       cooldown_remaining=session_state.cooldown_expiry - current_time)
+            return False, None
+
+        # One uniform draw picks the mode; landing past the last bound means no failure
+        adjusted_probabilities, cumulative = self._selection_table(
+            session_state.clarification_requests >= 1, session_state.last_failure_mode
+        )
+        index = bisect_right(cumulative, random.random())
+        if index == len(cumulative):
+            return False, None
+
+        mode = self.modes[index]
+
+        # Update session state
+        session_state.failure_count += 1
+        session_state.cooldown_expiry = current_time + FAILURE_COOLDOWN_SECONDS
+        session_state.last_failure_mode = mode
+
+        if mode == FailureMode.INFINITE_LOOP:
+            session_state.clarification_requests += 1
+        else:
+            session_state.clarification_requests = 0  # Reset if not loop
+
+        logger.info("Probabilistic failure triggered",
+                   session_id=session_id,
+                   failure_mode=mode,
+                   probability=adjusted_probabilities[index],
+                   session_failure_count=session_state.failure_count)
+        return True, mode
+
+    def _selection_table(self, looping: bool,
+                         last_failure_mode: Optional[FailureMode]) -> Tuple[List[float], List[float]]:
+        """
+        Adjusted probability of each mode, and the cumulative probability of each mode
+        being the one selected when the modes are rolled in order until one hits.
+        """
+        key = (looping, last_failure_mode)
+        table = self._selection_tables.get(key)
+        if table is not None:
+            return table
+
+        adjusted_probabilities = []
         for mode, config in self.failure_scenarios.items():
             adjusted_probability = config["probability"] * self.failure_rate_multiplier
 
             # Special logic for INFINITE_LOOP - increase probability if already in loop pattern
-            if mode == FailureMode.INFINITE_LOOP and session_state["clarification_requests"] >= 1:
+            if mode == FailureMode.INFINITE_LOOP and looping:
                 adjusted_probability *= 2.0  # Double probability if already looping
 
             # Reduce probability if same failure mode was used recently
-            if session_state["last_failure_mode"] == mode:
+            if last_failure_mode == mode:
                 adjusted_probability *= 0.3  # Reduce to 30% to avoid repetition
 
-            # Roll for failure
-            if random.random() < adjusted_probability:
-                # Update session state
-                session_state["failure_count"] += 1
-                session_state["last_failure_time"] = current_time
-                session_state["last_failure_mode"] = mode
-
-                if mode == FailureMode.INFINITE_LOOP:
-                    session_state["clarification_requests"] += 1
-                else:
-                    session_state["clarification_requests"] = 0  # Reset if not loop
-
-                logger.info("Probabilistic failure triggered",
-                           session_id=session_id,
-                           failure_mode=mode,
-                           probability=adjusted_probability,
-                           session_failure_count=session_state["failure_count"])
-                return True, mode
+            adjusted_probabilities.append(adjusted_probability)
 
-        return False, None
+        cumulative = []
+        selected = 0.0
+        none_selected = 1.0  # Probability that no earlier mode hit
+        for adjusted_probability in adjusted_probabilities:
+            hit = min(adjusted_probability, 1.0)
+            selected += none_selected * hit
+            none_selected *= 1.0 - hit
+            cumulative.append(selected)
+
+        table = self._selection_tables[key] = (adjusted_probabilities, cumulative)
+        return table
     
     async def inject_output_quality_failure(self, session_id: str, failure_mode: FailureMode, original_response: str) -> str:
         config = self.failure_scenarios[failure_mode]
@@ -206,17 +292,17 @@ class FailureInjector:
         metrics_collector.record_failure_injection(failure_mode.value, "default")
 
         if failure_mode == FailureMode.HALLUCINATION:
-            hallucinated_response = random.choice(config["responses"])
+            hallucinated_response = _pick_response(config["responses"])
             logger.warning("Injecting hallucination", session_id=session_id, original_length=len(original_response))
             return hallucinated_response
 
         elif failure_mode == FailureMode.INCORRECT_REASONING:
-            incorrect_response = random.choice(config["logic_errors"])
+            incorrect_response = _pick_response(config["logic_errors"])
             logger.warning("Injecting incorrect reasoning", session_id=session_id)
             return incorrect_response
 
         elif failure_mode == FailureMode.OFF_TOPIC:
-            off_topic_response = random.choice(config["off_topic_responses"])
+            off_topic_response = _pick_response(config["off_topic_responses"])
             logger.warning("Injecting off-topic response", session_id=session_id)
             return off_topic_response
 
@@ -229,12 +315,12 @@ class FailureInjector:
         metrics_collector.record_failure_injection(failure_mode.value, "default")
 
         if failure_mode == FailureMode.INFINITE_LOOP:
-            loop_response = random.choice(config["loop_responses"])
+            loop_response = _pick_response(config["loop_responses"])
             logger.warning("Injecting infinite loop behavior", session_id=session_id)
             return loop_response
 
         elif failure_mode == FailureMode.REFUSING_PROGRESS:
-            refusal_response = random.choice(config["refusal_responses"])
+            refusal_response = _pick_response(config["refusal_responses"])
             logger.warning("Injecting refusing progress behavior", session_id=session_id)
             return refusal_response
 
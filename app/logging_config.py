@@ -1,34 +1,49 @@
 import os
+import atexit
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import structlog
 from pythonjsonlogger import jsonlogger
 
 
+# Processor chain shared by every structlog logger; built once at import
+PROCESSORS = (
+    structlog.stdlib.filter_by_level,
+    structlog.stdlib.add_logger_name,
+    structlog.stdlib.add_log_level,
+    structlog.stdlib.PositionalArgumentsFormatter(),
+    structlog.processors.TimeStamper(fmt="iso"),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.format_exc_info,
+    structlog.processors.UnicodeDecoder(),
+    structlog.processors.JSONRenderer()
+)
+
+
 def setup_logging():
-    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_level = logging.getLevelNamesMapping()[os.getenv("LOG_LEVEL", "INFO").upper()]
     
     # Configure standard logging
     logging.basicConfig(
-        level=getattr(logging, log_level),
+        level=log_level,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
     
+    # Stack rendering is only wanted while debugging
+    processors = PROCESSORS
+    if log_level >= logging.INFO:
+        processors = tuple(
+            p for p in PROCESSORS if not isinstance(p, structlog.processors.StackInfoRenderer)
+        )
+    
     # Configure structured logging
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
-        ],
+        processors=processors,
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        # Calls below LOG_LEVEL are no-ops: no event dict is built and no processors run
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
         cache_logger_on_first_use=True,
     )
     
@@ -40,9 +55,15 @@ def setup_logging():
     )
     file_handler.setFormatter(formatter)
     
-    # Add file handler to root logger
+    # File writes happen on a listener thread; the event loop only enqueues records
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # Add queue handler to root logger
     root_logger = logging.getLogger()
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(QueueHandler(log_queue))
     
     # Set specific loggers
     logging.getLogger("uvicorn").setLevel(logging.INFO)
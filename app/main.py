@@ -11,6 +11,7 @@ from .redis_client import init_redis, close_redis
 from .routes import router
 from .logging_config import setup_logging
 from .metrics import agent_service_info
+from .agent_service import close_http_client
 
 
 @asynccontextmanager
@@ -29,6 +30,7 @@ async def lifespan(app: FastAPI):
     yield
     await close_db()
     await close_redis()
+    await close_http_client()
 
 
 app = FastAPI(
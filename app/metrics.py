@@ -1,6 +1,7 @@
 from prometheus_client import Counter, Histogram, Gauge, Info
+import collections
 import time
-from functools import wraps
+from functools import lru_cache, wraps
 
 # Agent response metrics
 agent_requests_total = Counter(
@@ -22,6 +23,13 @@ failure_injections_total = Counter(
     ['failure_mode', 'scenario']
 )
 
+# Rows a background batch writer gave up on after exhausting its retries
+batch_rows_dropped_total = Counter(
+    'batch_rows_dropped_total',
+    'Rows dropped by background database batch writers after all retries failed',
+    ['table']
+)
+
 # Performance counters
 token_consumption_total = Counter(
     'token_consumption_total',
@@ -108,19 +116,59 @@ baseline_update_total = Counter(
     ['update_reason']
 )
 
+# Validation error keywords and the error type they map to, checked in order
+VALIDATION_ERROR_RULES = (
+    (("inappropriate", "profanity"), "inappropriate_content"),
+    (("empty",), "empty_output"),
+    (("quality",), "low_quality"),
+    (("confidence", "overconfident"), "confidence_issue"),
+    (("coherence", "gibberish"), "coherence_issue"),
+    (("format", "structure"), "format_issue"),
+)
+
+
+@lru_cache(maxsize=512)
+def _classify_validation_error(error_message: str) -> str:
+    """Error type for a validation message; the messages come from a small fixed set."""
+    error_lower = error_message.lower()
+
+    for keywords, error_type in VALIDATION_ERROR_RULES:
+        if any(keyword in error_lower for keyword in keywords):
+            return error_type
+
+    return "other"
+
 
 class MetricsCollector:
     def __init__(self):
         self.start_time = time.time()
+        # Labelled children for the bounded label sets below, bound on first use
+        self._validation_children = {}
+        self._request_children = {}
+        self._injection_children = {}
 
     def record_agent_request(self, failure_type: str, status: str, duration: float):
         """Record metrics for an agent request"""
-        agent_requests_total.labels(failure_type=failure_type, status=status).inc()
-        agent_response_duration.labels(failure_type=failure_type).observe(duration)
+        key = (failure_type, status)
+        children = self._request_children.get(key)
+        if children is None:
+            children = self._request_children[key] = (
+                agent_requests_total.labels(failure_type=failure_type, status=status),
+                agent_response_duration.labels(failure_type=failure_type),
+            )
+        requests_total, response_duration = children
+        requests_total.inc()
+        response_duration.observe(duration)
 
     def record_failure_injection(self, failure_mode: str, scenario: str):
         """Record when a failure is injected"""
-        failure_injections_total.labels(failure_mode=failure_mode, scenario=scenario).inc()
+        key = (failure_mode, scenario)
+        injections_total = self._injection_children.get(key)
+        if injections_total is None:
+            injections_total = self._injection_children[key] = failure_injections_total.labels(
+                failure_mode=failure_mode, scenario=scenario
+            )
+        injections_total.inc()
 
     def record_token_usage(self, model: str, prompt_tokens: int, completion_tokens: int):
         """Record token consumption"""
@@ -136,49 +184,43 @@ class MetricsCollector:
                                passed: bool, confidence: float, duration: float,
                                errors: list = None):
         """Record validation check metrics"""
-        result = "passed" if passed else "failed"
+        checks_passed, checks_failed, confidence_score, processing_duration = \
+            self._validation_metrics(validation_level, strategy)
 
         # Record the validation check
-        validation_checks_total.labels(
-            validation_level=validation_level,
-            strategy=strategy,
-            result=result
-        ).inc()
+        (checks_passed if passed else checks_failed).inc()
 
         # Record confidence score
-        validation_confidence_score.labels(validation_level=validation_level).observe(confidence)
+        confidence_score.observe(confidence)
 
         # Record processing time
-        validation_processing_duration.labels(validation_level=validation_level).observe(duration)
+        processing_duration.observe(duration)
 
-        # Record specific errors
+        # Record specific errors, one increment per error type
         if errors:
-            for error in errors:
-                # Extract error type from error message (simple classification)
-                error_type = self._classify_validation_error(error)
+            error_counts = collections.Counter(_classify_validation_error(error) for error in errors)
+            for error_type, count in error_counts.items():
                 validation_errors_total.labels(
                     error_type=error_type,
                     strategy=strategy
-                ).inc()
+                ).inc(count)
+
+    def _validation_metrics(self, validation_level: str, strategy: str) -> tuple:
+        """Passed/failed check counters, confidence and duration histograms for a level and strategy."""
+        key = (validation_level, strategy)
+        children = self._validation_children.get(key)
+        if children is None:
+            children = self._validation_children[key] = (
+                validation_checks_total.labels(validation_level=validation_level, strategy=strategy, result="passed"),
+                validation_checks_total.labels(validation_level=validation_level, strategy=strategy, result="failed"),
+                validation_confidence_score.labels(validation_level=validation_level),
+                validation_processing_duration.labels(validation_level=validation_level),
+            )
+        return children
 
     def _classify_validation_error(self, error_message: str) -> str:
         """Classify validation errors into types for metrics"""
-        error_lower = error_message.lower()
-
-        if "inappropriate" in error_lower or "profanity" in error_lower:
-            return "inappropriate_content"
-        elif "empty" in error_lower:
-            return "empty_output"
-        elif "quality" in error_lower:
-            return "low_quality"
-        elif "confidence" in error_lower or "overconfident" in error_lower:
-            return "confidence_issue"
-        elif "coherence" in error_lower or "gibberish" in error_lower:
-            return "coherence_issue"
-        elif "format" in error_lower or "structure" in error_lower:
-            return "format_issue"
-        else:
-            return "other"
+        return _classify_validation_error(error_message)
 
     def record_behavioral_anomaly(self, session_id: str, anomaly_type: str,
                                  score: float, session_type: str = "standard"):
@@ -31,6 +31,7 @@ class InteractionStatus(str, Enum):
     FAILURE = "failure"
     TIMEOUT = "timeout"
     ERROR = "error"
+    NOT_CALLED = "not_called"  # natural_status only: the LLM was skipped
 
 
 class AgentRequest(BaseModel):
@@ -117,6 +118,15 @@ class BehavioralBaseline(BaseModel):
     interaction_count: int
     established_at: datetime
     last_updated: datetime
+    # Running (Welford) statistics behind avg_response_latency, normal_clarification_rate
+    # and the confidence average/variance; decayed by the existing weight on each update
+    running_count: float = 0.0
+    running_mean_latency: float = 0.0
+    running_m2_latency: float = 0.0
+    running_mean_clarification: float = 0.0
+    running_m2_clarification: float = 0.0
+    running_mean_confidence: float = 0.0
+    running_m2_confidence: float = 0.0
 
 
 class ConversationFlowMetrics(BaseModel):
@@ -1,15 +1,39 @@
 import os
-import json
+import asyncio
+import orjson
 import redis.asyncio as redis
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import structlog
 
 logger = structlog.get_logger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 
+# Per-message state fields, each stored as its own Redis list and appended in lockstep:
+# "messages" holds OpenAI-ready {"role", "content"} dicts, "history_meta" the matching
+# timestamp/failure_mode/token_count sidecar
+HISTORY_FIELDS = ("messages", "history_meta")
+
+# Numeric state fields that appends adjust with HINCRBY/HINCRBYFLOAT instead of
+# overwriting, so concurrent writers for one session don't lose each other's counts
+COUNTER_FIELDS = ("token_count_total", "failure_count", "recovery_count")
+
+# Window in which repeated saves for one session collapse into a single write
+SAVE_DEBOUNCE_SECONDS = 0.05
+
+# Attempts for one background append before its entries are given up on; the
+# wait between attempts doubles from SAVE_DEBOUNCE_SECONDS
+SAVE_MAX_ATTEMPTS = 3
+
 redis_client: Optional[redis.Redis] = None
 
+# Latest not-yet-written state per session; served to readers until the write lands.
+# This is per-process, so read-your-writes only holds for requests served by the
+# worker that scheduled the write
+_pending_states: Dict[str, Dict[str, Any]] = {}
+# Background writer task per session with pending state
+_write_tasks: Dict[str, asyncio.Task] = {}
+
 
 async def init_redis():
     global redis_client
@@ -24,6 +48,8 @@ async def init_redis():
 
 async def close_redis():
     global redis_client
+    if _write_tasks:
+        await asyncio.gather(*_write_tasks.values(), return_exceptions=True)
     if redis_client:
         await redis_client.close()
         logger.info("Redis connection closed")
@@ -37,50 +63,202 @@ class StateManager:
     def redis(self):
         return redis_client
     
+    @staticmethod
+    def _state_keys(session_id: str) -> Tuple[str, Dict[str, str]]:
+        return (
+            f"agent_state:{session_id}:meta",
+            {field: f"agent_state:{session_id}:{field}" for field in HISTORY_FIELDS}
+        )
+
     async def save_state(self, session_id: str, state_data: Dict[str, Any], ttl: int = 3600):
+        """Overwrite the full state: scalar fields in a hash, each history field in a list."""
         try:
             if not self.redis:
                 logger.warning("Redis client not initialized", session_id=session_id)
                 return
-            key = f"agent_state:{session_id}"
-            await self.redis.setex(key, ttl, json.dumps(state_data))
+            meta_key, history_keys = self._state_keys(session_id)
+            meta = {k: v for k, v in state_data.items() if k not in HISTORY_FIELDS}
+            async with self.redis.pipeline() as pipe:
+                pipe.delete(meta_key, *history_keys.values())
+                if meta:
+                    pipe.hset(meta_key, mapping={k: orjson.dumps(v) for k, v in meta.items()})
+                for field, key in history_keys.items():
+                    entries = state_data.get(field)
+                    if entries:
+                        pipe.rpush(key, *(orjson.dumps(e) for e in entries))
+                    pipe.expire(key, ttl)
+                pipe.expire(meta_key, ttl)
+                await pipe.execute()
             logger.debug("Agent state saved", session_id=session_id)
         except Exception as e:
             logger.error("Failed to save agent state", session_id=session_id, error=str(e))
             raise
-    
-    async def load_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+
+    async def append_state(self, session_id: str, state_data: Dict[str, Any],
+                           new_entries: Dict[str, List[Dict[str, Any]]],
+                           increments: Optional[Dict[str, float]] = None, ttl: int = 3600):
+        """
+        Write the scalar fields and append only the new entries of each history field.
+
+        Counter fields are never overwritten here: their value in state_data is ignored
+        and increments (field -> delta) is added to the stored value instead. Every
+        counter is incremented, by 0 if unchanged, so its hash field always exists.
+        """
+        try:
+            if not self.redis:
+                logger.warning("Redis client not initialized", session_id=session_id)
+                return
+            meta_key, history_keys = self._state_keys(session_id)
+            meta = {
+                k: v for k, v in state_data.items()
+                if k not in HISTORY_FIELDS and k not in COUNTER_FIELDS
+            }
+            async with self.redis.pipeline() as pipe:
+                if meta:
+                    pipe.hset(meta_key, mapping={k: orjson.dumps(v) for k, v in meta.items()})
+                for field, delta in {**dict.fromkeys(COUNTER_FIELDS, 0), **(increments or {})}.items():
+                    if isinstance(delta, int):
+                        pipe.hincrby(meta_key, field, delta)
+                    else:
+                        pipe.hincrbyfloat(meta_key, field, delta)
+                for field, key in history_keys.items():
+                    entries = new_entries.get(field)
+                    if entries:
+                        pipe.rpush(key, *(orjson.dumps(e) for e in entries))
+                    pipe.expire(key, ttl)
+                pipe.expire(meta_key, ttl)
+                await pipe.execute()
+            logger.debug("Agent state appended", session_id=session_id,
+                         new_messages=len(new_entries.get("messages", ())))
+        except Exception as e:
+            logger.error("Failed to append agent state", session_id=session_id, error=str(e))
+            raise
+
+    def schedule_append(self, session_id: str, state_data: Dict[str, Any],
+                        new_entries: Dict[str, List[Dict[str, Any]]],
+                        increments: Optional[Dict[str, float]] = None, ttl: int = 3600):
+        """Append state in the background, coalescing rapid updates to the same session."""
+        entry = _pending_states.get(session_id)
+        if entry is None:
+            entry = _pending_states[session_id] = {
+                "entries": {field: [] for field in HISTORY_FIELDS}, "increments": {},
+                "version": 0, "in_flight": False
+            }
+            task = asyncio.create_task(self._write_pending_state(session_id, entry))
+            _write_tasks[session_id] = task
+            task.add_done_callback(
+                lambda done: _write_tasks.pop(session_id) if _write_tasks.get(session_id) is done else None
+            )
+        entry["state"] = state_data
+        entry["ttl"] = ttl
+        for field, entries in new_entries.items():
+            entry["entries"][field].extend(entries)
+        for field, delta in (increments or {}).items():
+            entry["increments"][field] = entry["increments"].get(field, 0) + delta
+        entry["version"] += 1
+
+    async def _write_pending_state(self, session_id: str, entry: Dict[str, Any]):
+        delay = SAVE_DEBOUNCE_SECONDS
+        attempt = 0
+        while True:
+            await asyncio.sleep(delay)
+            if _pending_states.get(session_id) is not entry:  # Deleted while waiting
+                return
+            version = entry["version"]
+            new_entries, entry["entries"] = entry["entries"], {field: [] for field in HISTORY_FIELDS}
+            increments, entry["increments"] = entry["increments"], {}
+            entry["in_flight"] = True
+            try:
+                await self.append_state(session_id, entry["state"], new_entries, increments, entry["ttl"])
+            except Exception:
+                # Already logged by append_state; requeue ahead of anything scheduled since
+                attempt += 1
+                if _pending_states.get(session_id) is not entry:
+                    return
+                if attempt < SAVE_MAX_ATTEMPTS:
+                    for field, entries in new_entries.items():
+                        entry["entries"][field][:0] = entries
+                    for field, delta in increments.items():
+                        entry["increments"][field] = entry["increments"].get(field, 0) + delta
+                    delay = SAVE_DEBOUNCE_SECONDS * 2 ** attempt
+                    continue
+                logger.error("Dropped pending agent state after retries",
+                             session_id=session_id, attempts=attempt,
+                             dropped_messages=len(new_entries.get("messages", ())))
+            finally:
+                entry["in_flight"] = False
+            attempt = 0
+            delay = SAVE_DEBOUNCE_SECONDS
+            # A newer state may have been scheduled while this write was in flight
+            if _pending_states.get(session_id) is not entry:
+                return
+            if entry["version"] == version:
+                del _pending_states[session_id]
+                return
+
+    async def load_state(self, session_id: str, history_limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load agent state, optionally fetching only the most recent history entries.
+
+        Args:
+            session_id: Session identifier
+            history_limit: If set, only the last N entries of each history field are read
+        """
+        pending = _pending_states.get(session_id)
+        if pending is not None:
+            state = pending["state"]
+            if history_limit is not None:
+                state = dict(state, **{field: state[field][-history_limit:] for field in HISTORY_FIELDS})
+            return state
         try:
             if not self.redis:
                 logger.warning("Redis client not initialized", session_id=session_id)
                 return None
-            key = f"agent_state:{session_id}"
-            state_json = await self.redis.get(key)
-            if state_json:
-                return json.loads(state_json)
-            return None
+            meta_key, history_keys = self._state_keys(session_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(meta_key)
+                for key in history_keys.values():
+                    pipe.lrange(key, -history_limit if history_limit else 0, -1)
+                meta, *histories = await pipe.execute()
+            if not meta:
+                return None
+            state = {k: orjson.loads(v) for k, v in meta.items()}
+            # Counters only appear once an append has incremented them
+            for field in COUNTER_FIELDS:
+                state.setdefault(field, 0)
+            for field, entries in zip(history_keys, histories):
+                state[field] = [orjson.loads(e) for e in entries]
+            return state
         except Exception as e:
             logger.error("Failed to load agent state", session_id=session_id, error=str(e))
             return None
-    
+
     async def delete_state(self, session_id: str):
+        entry = _pending_states.pop(session_id, None)
+        task = _write_tasks.get(session_id)
+        if task is not None and not task.done():
+            if entry is not None and entry["in_flight"]:
+                # Let the in-flight append land first so it can't recreate the keys afterwards
+                await asyncio.gather(asyncio.shield(task), return_exceptions=True)
+            else:
+                task.cancel()
         try:
             if not self.redis:
                 logger.warning("Redis client not initialized", session_id=session_id)
                 return
-            key = f"agent_state:{session_id}"
-            await self.redis.delete(key)
+            meta_key, history_keys = self._state_keys(session_id)
+            await self.redis.delete(meta_key, *history_keys.values())
             logger.debug("Agent state deleted", session_id=session_id)
         except Exception as e:
             logger.error("Failed to delete agent state", session_id=session_id, error=str(e))
-    
+
     async def create_checkpoint(self, session_id: str, checkpoint_name: str, state_data: Dict[str, Any]):
         try:
             if not self.redis:
                 logger.warning("Redis client not initialized", session_id=session_id)
                 return
             key = f"checkpoint:{session_id}:{checkpoint_name}"
-            await self.redis.setex(key, 7200, json.dumps(state_data))  # 2 hour TTL for checkpoints
+            await self.redis.setex(key, 7200, orjson.dumps(state_data))  # 2 hour TTL for checkpoints
             logger.debug("Checkpoint created", session_id=session_id, checkpoint=checkpoint_name)
         except Exception as e:
             logger.error("Failed to create checkpoint", session_id=session_id, checkpoint=checkpoint_name, error=str(e))
@@ -93,7 +271,7 @@ class StateManager:
             key = f"checkpoint:{session_id}:{checkpoint_name}"
             checkpoint_json = await self.redis.get(key)
             if checkpoint_json:
-                return json.loads(checkpoint_json)
+                return orjson.loads(checkpoint_json)
             return None
         except Exception as e:
             logger.error("Failed to restore checkpoint", session_id=session_id, checkpoint=checkpoint_name, error=str(e))
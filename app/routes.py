@@ -9,7 +9,7 @@ from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from .models import AgentRequest, AgentResponse, FailureScenario, SystemMetric, FailureMode
 from .agent_service import CustomerServiceAgent
-from .database import get_db_session, AgentInteraction, FailureScenario as DBFailureScenario, SystemMetric as DBSystemMetric
+from .database import get_db_session, batch_writer_status, AgentInteraction, FailureScenario as DBFailureScenario, SystemMetric as DBSystemMetric
 from .redis_client import StateManager
 from .metrics import metrics_collector
 
@@ -60,35 +60,32 @@ async def get_session_history(
     db: AsyncSession = Depends(get_db_session)
 ):
     try:
-        # Get from database
-        stmt = select(AgentInteraction).where(
+        # Get from database; plain column rows, this read path needs no ORM entities
+        stmt = select(
+            AgentInteraction.id,
+            AgentInteraction.timestamp,
+            AgentInteraction.request_data.label("request"),
+            AgentInteraction.response_data.label("response"),
+            AgentInteraction.status,
+            AgentInteraction.natural_status,
+            AgentInteraction.failure_mode,
+            AgentInteraction.failure_injection_applied,
+            AgentInteraction.natural_response,
+            AgentInteraction.processing_time_ms,
+            AgentInteraction.token_count
+        ).where(
             AgentInteraction.session_id == session_id
         ).order_by(AgentInteraction.timestamp)
         
         result = await db.execute(stmt)
-        interactions = result.scalars().all()
+        interactions = [dict(row) for row in result.mappings()]
         
         # Also get current state from Redis
         current_state = await state_manager.load_state(session_id)
         
         return {
             "session_id": session_id,
-            "interactions": [
-                {
-                    "id": interaction.id,
-                    "timestamp": interaction.timestamp,
-                    "request": interaction.request_data,
-                    "response": interaction.response_data,
-                    "status": interaction.status,
-                    "natural_status": interaction.natural_status,
-                    "failure_mode": interaction.failure_mode,
-                    "failure_injection_applied": interaction.failure_injection_applied,
-                    "natural_response": interaction.natural_response,
-                    "processing_time_ms": interaction.processing_time_ms,
-                    "token_count": interaction.token_count
-                }
-                for interaction in interactions
-            ],
+            "interactions": interactions,
             "current_state": current_state
         }
     except Exception as e:
@@ -220,6 +217,14 @@ async def health_check(db: AsyncSession = Depends(get_db_session)):
             health_status["checks"]["redis"] = {"status": "unhealthy", "error": str(e)}
             overall_healthy = False
 
+        # Check background batch writers
+        writers = batch_writer_status()
+        if any(writer["failing"] for writer in writers.values()):
+            health_status["checks"]["persistence"] = {"status": "unhealthy", "writers": writers}
+            overall_healthy = False
+        else:
+            health_status["checks"]["persistence"] = {"status": "healthy", "writers": writers}
+
         # Check LLM service
         try:
             import time
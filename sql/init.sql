@@ -71,8 +71,8 @@ INSERT INTO failure_scenarios (name, description, failure_type, config) VALUES
 ('stuck_pattern', 'Agent refuses to progress without perfect information', 'behavioral', '{"perfectionism_threshold": 0.9, "clarification_loop_limit": 5}');
 
 -- Create indexes for better query performance
-CREATE INDEX idx_session_id ON agent_interactions(session_id);
-CREATE INDEX idx_timestamp ON agent_interactions(timestamp);
+CREATE INDEX idx_session_time ON agent_interactions(session_id, timestamp DESC);
+CREATE INDEX idx_timestamp ON agent_interactions USING BRIN (timestamp) WITH (pages_per_range = 32);
 CREATE INDEX idx_status ON agent_interactions(status);
 CREATE INDEX idx_natural_status ON agent_interactions(natural_status);
 CREATE INDEX idx_failure_mode ON agent_interactions(failure_mode);
@@ -82,9 +82,9 @@ CREATE INDEX idx_strategy ON recovery_attempts(recovery_strategy);
 CREATE INDEX idx_success ON recovery_attempts(success);
 CREATE INDEX idx_snapshot_session_id ON agent_state_snapshots(session_id);
 CREATE INDEX idx_snapshot_type ON agent_state_snapshots(snapshot_type);
-CREATE INDEX idx_snapshot_timestamp ON agent_state_snapshots(timestamp);
+CREATE INDEX idx_snapshot_timestamp ON agent_state_snapshots USING BRIN (timestamp) WITH (pages_per_range = 32);
 CREATE INDEX idx_metric_type ON system_metrics(metric_type);
-CREATE INDEX idx_metric_timestamp ON system_metrics(timestamp);
+CREATE INDEX idx_metric_timestamp ON system_metrics USING BRIN (timestamp) WITH (pages_per_range = 32);
 CREATE INDEX idx_exceeded_threshold ON system_metrics(exceeded_threshold);
 CREATE INDEX idx_interactions_session_status ON agent_interactions(session_id, status);
 CREATE INDEX idx_interactions_failure_timestamp ON agent_interactions(failure_mode, timestamp);
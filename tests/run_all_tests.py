@@ -19,6 +19,7 @@ def run_tests():
     test_files = [
         "tests/test_behavioral_e2e.py",
         "tests/test_validation_e2e.py",
+        "tests/test_redis_state.py",
         "tests/test_natural_vs_observed.py"
     ]
 
@@ -8,6 +8,7 @@ and integration with the agent service.
 
 import pytest
 import asyncio
+import json
 import time
 from datetime import datetime, timedelta
 from typing import List
@@ -18,12 +19,15 @@ from app.behavioral.monitoring_service import BehavioralMonitoringService
 from app.validation.strategies.behavioral_anomaly_strategy import BehavioralAnomalyStrategy, InteractionConsistencyStrategy
 from app.validation import create_behavioral_aware_validator, ValidationLevel
 from app.models import (
-    AgentRequest, AgentResponse, InteractionStatus, InteractionBehavior, BehavioralBaseline,
+    AgentRequest, AgentResponse, InteractionStatus, FailureMode, InteractionBehavior, BehavioralBaseline,
     ConversationFlowMetrics, DriftScore, PatternAnalysis
 )
-from app.database import InteractionBehaviorLog, BehavioralAnomalyLog, BehavioralBaseline as BehavioralBaselineDB
+from app.database import (
+    BatchWriter, InteractionBehaviorLog, BehavioralAnomalyLog,
+    AgentInteraction as AgentInteractionDB, BehavioralBaseline as BehavioralBaselineDB
+)
 from app.agent_service import CustomerServiceAgent
-from app.metrics import MetricsCollector
+from app.metrics import MetricsCollector, batch_rows_dropped_total
 
 
 class TestBehavioralTrackingE2E:
@@ -129,6 +133,41 @@ class TestBehavioralTrackingE2E:
         for i, response_text in enumerate(recent_responses):
             assert f"Response {i}:" in response_text
 
+    def test_phrase_counts_ignore_case(self, interaction_tracker, sample_request, sample_response):
+        """Test clarification and confidence phrases are matched regardless of case."""
+        response = sample_response.model_copy(update={
+            "response": "I don't understand. I think it is DEFINITELY your password."
+        })
+
+        behavior = interaction_tracker.track_interaction(
+            session_id="test_session_case",
+            request=sample_request,
+            response=response,
+            start_time=time.monotonic_ns()
+        )
+
+        assert behavior.clarification_frequency == 1.0
+        assert behavior.confidence_expressions == 2
+
+    def test_history_stays_chronological_when_clock_steps_back(
+        self, interaction_tracker, sample_request, sample_response
+    ):
+        """Drift windows binary search the history, so its timestamps must never decrease."""
+        now = datetime.now()
+        clock = [now, now - timedelta(hours=2), now + timedelta(seconds=1)]
+        with patch("app.behavioral.interaction_tracker.datetime") as mock_datetime:
+            mock_datetime.now.side_effect = clock
+            for _ in clock:
+                interaction_tracker.track_interaction(
+                    session_id="test_session_clock",
+                    request=sample_request,
+                    response=sample_response,
+                    start_time=time.monotonic_ns()
+                )
+
+        timestamps = [b.timestamp for b in interaction_tracker.get_recent_behaviors("test_session_clock")]
+        assert timestamps == [now, now, now + timedelta(seconds=1)]
+
     def test_baseline_establishment_flow(self, baseline_manager, interaction_tracker):
         """Test baseline establishment and updating flow."""
         session_id = "test_session_baseline"
@@ -181,6 +220,14 @@ class TestBehavioralTrackingE2E:
         assert updated_baseline is not None
         assert updated_baseline.interaction_count == 6
 
+        # Averages come from the decayed running statistics: 3.5 weighted prior
+        # observations at the old mean plus the new one
+        assert updated_baseline.avg_response_latency == updated_baseline.running_mean_latency
+        assert updated_baseline.avg_response_latency == pytest.approx(1300 + 1700 / 4.5)
+        assert updated_baseline.normal_clarification_rate == pytest.approx(0.1 + 0.7 / 4.5)
+        assert updated_baseline.confidence_pattern["average"] == pytest.approx(2 + 6 / 4.5)
+        assert updated_baseline.confidence_pattern["variance"] > 0
+
     def test_temporal_analysis_flow(self, temporal_analyzer):
         """Test temporal behavioral analysis flow."""
         session_id = "test_session_temporal"
@@ -269,6 +316,21 @@ class TestBehavioralTrackingE2E:
         assert alternating_result["confidence"] == 0.9
         assert alternating_result["pattern_length"] == 2
 
+        # Test longer cycle loop
+        periodic_responses = [
+            "Please clarify",
+            "I need more info",
+            "Which account?",
+            "Please clarify",
+            "I need more info",
+            "Which account?"
+        ]
+
+        periodic_result = temporal_analyzer.detect_response_loops(periodic_responses)
+        assert periodic_result is not None
+        assert periodic_result["loop_type"] == "periodic_pattern"
+        assert periodic_result["pattern_length"] == 3
+
         # Test low diversity loop
         low_diversity_responses = [
             "I can help with that",
@@ -433,6 +495,7 @@ class TestAgentServiceBehavioralIntegration:
         manager = AsyncMock()
         manager.load_state = AsyncMock(return_value=None)
         manager.save_state = AsyncMock()
+        manager.schedule_append = Mock()
         manager.create_checkpoint = AsyncMock()
         manager.track_failure_count = AsyncMock()
         return manager
@@ -441,7 +504,7 @@ class TestAgentServiceBehavioralIntegration:
     def mock_failure_injector(self):
         """Mock failure injector for testing."""
         injector = Mock()
-        injector.should_inject_failure = AsyncMock(return_value=(False, None))
+        injector.should_inject_failure = Mock(return_value=(False, None))
         injector.reset_session_state = Mock()
         return injector
 
@@ -472,6 +535,8 @@ class TestAgentServiceBehavioralIntegration:
         # Verify behavioral monitoring is enabled (new service layer)
         assert agent.behavioral_monitoring is not None
         assert agent.output_validator is not None
+        agent.behavioral_monitoring.behavior_writer = Mock()
+        agent.behavioral_monitoring.anomaly_writer = Mock()
 
         # Create test request
         request = AgentRequest(
@@ -483,20 +548,58 @@ class TestAgentServiceBehavioralIntegration:
 
         # Test the complete flow
         async def run_test():
-            response = await agent.process_request(request, mock_db_session)
+            with patch('app.agent_service.interaction_writer') as mock_writer:
+                response = await agent.process_request(request, mock_db_session)
 
             # Verify response
             assert response.session_id == "test_integration_session"
             assert response.status == InteractionStatus.SUCCESS
             assert response.response == "Test response from AI"
 
-            # Verify database interaction was logged
-            mock_db_session.add.assert_called()
+            # Verify database interaction was queued for the batched writer
+            mock_writer.enqueue.assert_called_once()
+            row = mock_writer.enqueue.call_args.args[0]
+            assert row["session_id"] == "test_integration_session"
+            assert row["status"] == InteractionStatus.SUCCESS.value
+
+            # Behavioral records staged on the request session are committed
             mock_db_session.commit.assert_called()
 
         # Run the async test
         asyncio.run(run_test())
 
+    @patch.dict('os.environ', {'BEHAVIORAL_TRACKING_ENABLED': 'false'})
+    def test_integration_failure_skips_llm_call(
+        self,
+        mock_openai_client,
+        mock_db_session,
+        mock_redis_state_manager
+    ):
+        """Integration failures abort the request, so the natural LLM call is skipped."""
+        agent = CustomerServiceAgent()
+        agent.openai_client = mock_openai_client
+        agent.state_manager = mock_redis_state_manager
+
+        request = AgentRequest(
+            session_id="test_skip_natural_session",
+            message="Hello, I need help with my account",
+            failure_mode=FailureMode.AUTH_ERROR,
+            model="gpt-3.5-turbo"
+        )
+
+        async def run_test():
+            with patch('app.agent_service.interaction_writer'):
+                response = await agent.process_request(request, mock_db_session)
+
+            assert response.status == InteractionStatus.ERROR
+            assert response.failure_mode == FailureMode.AUTH_ERROR
+            assert response.failure_injection_applied
+            assert response.natural_response is None
+            assert response.natural_status == InteractionStatus.NOT_CALLED
+            mock_openai_client.chat.completions.create.assert_not_called()
+
+        asyncio.run(run_test())
+
 
 class TestLoopDetectionE2E:
     """End-to-end tests specifically for loop detection functionality."""
@@ -928,6 +1031,45 @@ class TestBehavioralPerformanceAndEdgeCases:
         baseline = manager.establish_baseline("insufficient_session", behaviors)
         assert baseline is None  # Should not establish baseline
 
+    def test_detect_deviation_batch_matches_single(self):
+        """Test batch deviation scoring against per-session scoring."""
+        manager = BaselineManager(min_interactions=3)
+
+        for session_id, latency in (("batch_a", 1000), ("batch_b", 2000)):
+            manager.establish_baseline(session_id, [
+                InteractionBehavior(
+                    session_id=session_id,
+                    response_latency_ms=latency,
+                    message_length=100 + i * 10,
+                    conversation_turns=i + 1,
+                    clarification_frequency=0.1,
+                    topic_switches=0,
+                    confidence_expressions=2,
+                    timestamp=datetime.now()
+                )
+                for i in range(3)
+            ])
+
+        current = [
+            InteractionBehavior(
+                session_id=session_id,
+                response_latency_ms=3000,
+                message_length=300,
+                conversation_turns=4,
+                clarification_frequency=0.5,
+                topic_switches=1,
+                confidence_expressions=6,
+                timestamp=datetime.now()
+            )
+            for session_id in ("batch_a", "batch_b", "no_baseline")
+        ]
+
+        scores = manager.detect_deviation_batch(current)
+
+        assert scores[0] == manager.detect_deviation(current[0], manager.get_baseline("batch_a"))
+        assert scores[1] == manager.detect_deviation(current[1], manager.get_baseline("batch_b"))
+        assert scores[2] is None
+
     def test_anomaly_detector_extreme_values(self):
         """Test anomaly detector with extreme values."""
         tracker = InteractionTracker()
@@ -1019,6 +1161,34 @@ class TestBehavioralPerformanceAndEdgeCases:
             metrics = tracker.get_session_metrics(session_id)
             assert metrics["interaction_count"] == 5
 
+    def test_least_recent_session_evicted(self):
+        """Test the tracker drops the least recently active session past its limit."""
+        tracker = InteractionTracker(max_sessions=2)
+
+        def track(session_id):
+            request = AgentRequest(session_id=session_id, message="Hi", context={}, model="gpt-3.5-turbo")
+            response = AgentResponse(
+                session_id=session_id,
+                response="Hello there",
+                status=InteractionStatus.SUCCESS,
+                natural_status=InteractionStatus.SUCCESS,
+                failure_injection_applied=False,
+                natural_response="Hello there",
+                processing_time_ms=100,
+                token_count=5,
+                model_used="gpt-3.5-turbo"
+            )
+            tracker.track_interaction(session_id, request, response, time.monotonic_ns())
+
+        track("session_a")
+        track("session_b")
+        track("session_a")  # session_b is now the least recently active
+        track("session_c")
+
+        assert sorted(tracker.get_all_session_ids()) == ["session_a", "session_c"]
+        assert tracker.get_recent_responses("session_b") == []
+        assert tracker.get_session_metrics("session_a")["interaction_count"] == 2
+
 
 class TestBehavioralMonitoringServiceE2E:
     """End-to-end tests for the new BehavioralMonitoringService."""
@@ -1040,16 +1210,19 @@ class TestBehavioralMonitoringServiceE2E:
         session = AsyncMock()
         session.add = Mock()
         session.commit = AsyncMock()
-        session.merge = Mock()
+        session.merge = AsyncMock()
         return session
 
     @pytest.fixture
     def behavioral_service(self, mock_metrics_collector, mock_db_session):
         """Create behavioral monitoring service with mocked dependencies."""
-        return BehavioralMonitoringService(
+        service = BehavioralMonitoringService(
             metrics_collector=mock_metrics_collector,
             db_session=mock_db_session
         )
+        service.behavior_writer = Mock()
+        service.anomaly_writer = Mock()
+        return service
 
     def test_service_initialization(self, behavioral_service):
         """Test that the service initializes correctly."""
@@ -1113,7 +1286,8 @@ class TestBehavioralMonitoringServiceE2E:
             session_id=session_id,
             request=request,
             response=response,
-            start_time=start_time
+            start_time=start_time,
+            include_session_metrics=True
         )
 
         # Verify results structure
@@ -1121,6 +1295,7 @@ class TestBehavioralMonitoringServiceE2E:
         assert "anomaly_results" in results
         assert "session_metrics" in results
         assert "monitoring_metadata" in results
+        assert results["session_metrics"]["interaction_count"] == 1
 
         # Verify behavior tracking worked
         behavior = results["behavior"]
@@ -1143,8 +1318,38 @@ class TestBehavioralMonitoringServiceE2E:
         behavioral_service.metrics_collector.increment_counter.assert_called()
         behavioral_service.metrics_collector.observe_histogram.assert_called()
 
-        # Verify database persistence
-        behavioral_service.db_session.add.assert_called()
+        # Verify database persistence was queued for the batched writer
+        behavioral_service.behavior_writer.enqueue.assert_called()
+        row = behavioral_service.behavior_writer.enqueue.call_args.args[0]
+        assert row["session_id"] == session_id
+        assert "interaction_metadata" in row
+
+    @pytest.mark.asyncio
+    async def test_error_results_follow_session_metrics_flag(self, behavioral_service):
+        """The failure response includes session_metrics only when it was requested."""
+        behavioral_service.interaction_tracker.track_interaction = Mock(side_effect=RuntimeError("tracker down"))
+        request = AgentRequest(session_id="error_shape_session", message="Hello", model="gpt-3.5-turbo")
+        response = AgentResponse(
+            session_id="error_shape_session",
+            response="Hi there",
+            status=InteractionStatus.SUCCESS,
+            natural_status=InteractionStatus.SUCCESS,
+            failure_injection_applied=False,
+            processing_time_ms=100,
+            token_count=5,
+            model_used="gpt-3.5-turbo"
+        )
+
+        without_metrics = await behavioral_service.process_interaction(
+            "error_shape_session", request, response, time.time()
+        )
+        with_metrics = await behavioral_service.process_interaction(
+            "error_shape_session", request, response, time.time(), include_session_metrics=True
+        )
+
+        assert without_metrics["monitoring_metadata"]["error"] == "tracker down"
+        assert "session_metrics" not in without_metrics
+        assert with_metrics["session_metrics"] == {}
 
     @pytest.mark.asyncio
     async def test_anomaly_detection_with_metrics_and_persistence(self, behavioral_service):
@@ -1219,8 +1424,9 @@ class TestBehavioralMonitoringServiceE2E:
             behavioral_service.metrics_collector.record_behavioral_anomaly.assert_called()
             behavioral_service.metrics_collector.record_conversation_flow_disruption.assert_called()
 
-        # Verify multiple database records were added (behaviors + anomalies)
-        assert behavioral_service.db_session.add.call_count >= 8  # 8 interactions + anomalies
+        # Verify multiple database records were queued (behaviors + anomalies)
+        assert behavioral_service.behavior_writer.enqueue.call_count == 8  # 8 interactions
+        behavioral_service.anomaly_writer.enqueue.assert_called()
 
     @pytest.mark.asyncio
     async def test_baseline_persistence_integration(self, behavioral_service):
@@ -1256,8 +1462,8 @@ class TestBehavioralMonitoringServiceE2E:
             )
 
         # Verify baseline was established and persisted
-        # The service should have called merge() for baseline persistence
-        behavioral_service.db_session.merge.assert_called()
+        # The service should have awaited merge() for baseline persistence
+        behavioral_service.db_session.merge.assert_awaited()
 
     def test_session_analysis_functionality(self, behavioral_service):
         """Test session analysis and metrics reporting."""
@@ -1311,7 +1517,7 @@ class TestBehavioralMonitoringServiceE2E:
         session_id = "error_test_session"
 
         # Mock database failure
-        behavioral_service.db_session.add.side_effect = Exception("Database connection failed")
+        behavioral_service.behavior_writer.enqueue.side_effect = Exception("Database connection failed")
 
         request = AgentRequest(
             session_id=session_id,
@@ -1513,6 +1719,161 @@ class TestDatabasePersistenceE2E:
         mock_db_session.merge.assert_called_once_with(baseline_record)
 
 
+class _FakeSession:
+    """Async session stand-in that records executed batches and fails on demand."""
+
+    def __init__(self, batches, failures):
+        self.batches = batches
+        self.failures = failures
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, rows):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.batches.append(list(rows))
+
+    async def commit(self):
+        pass
+
+
+class TestBatchWriter:
+    """Drives BatchWriter against a fake session and raw connection."""
+
+    @pytest.fixture
+    def fake_session(self, monkeypatch):
+        state = {"batches": [], "failures": []}
+        monkeypatch.setattr(
+            "app.database.async_session",
+            lambda: _FakeSession(state["batches"], state["failures"])
+        )
+        return state
+
+    @pytest.fixture
+    def fake_copy(self, monkeypatch):
+        copy_records = AsyncMock()
+        raw = Mock()
+        raw.driver_connection.copy_records_to_table = copy_records
+        conn = AsyncMock()
+        conn.get_raw_connection = AsyncMock(return_value=raw)
+        engine = Mock()
+        engine.connect = Mock(return_value=conn)
+        conn.__aenter__.return_value = conn
+        monkeypatch.setattr("app.database.engine", engine)
+        return copy_records
+
+    @staticmethod
+    def _behavior_row(session_id, index):
+        return {
+            "session_id": session_id,
+            "timestamp": datetime(2024, 1, 1) + timedelta(seconds=index),
+            "response_latency_ms": 100 + index,
+            "message_length": 50,
+            "conversation_turns": index,
+            "anomaly_score": 0.1,
+            "interaction_metadata": {"index": index},
+        }
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_queued_rows_in_batches(self, fake_session):
+        writer = BatchWriter(AgentInteractionDB, batch_size=3, flush_interval_ms=1000)
+        for i in range(7):
+            writer.enqueue({"session_id": "s", "request_id": f"r{i}"})
+        await writer.stop()
+
+        assert [len(batch) for batch in fake_session["batches"]] == [3, 3, 1]
+        flushed = [row["request_id"] for batch in fake_session["batches"] for row in batch]
+        assert flushed == [f"r{i}" for i in range(7)]
+        assert writer.status()["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self, fake_session):
+        fake_session["failures"].append(ConnectionError("connection reset"))
+        writer = BatchWriter(AgentInteractionDB, max_attempts=3, retry_backoff_ms=1)
+        writer.enqueue({"session_id": "s", "request_id": "r1"})
+        await writer.stop()
+
+        assert len(fake_session["batches"]) == 1
+        assert writer.dropped_rows == 0
+        assert writer.status()["failing"] is False
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_count_dropped_rows(self, fake_session):
+        fake_session["failures"].extend(ConnectionError("database down") for _ in range(2))
+        writer = BatchWriter(AgentInteractionDB, max_attempts=2, retry_backoff_ms=1)
+        dropped_metric = batch_rows_dropped_total.labels(table="agent_interactions")
+        before = dropped_metric._value.get()
+
+        writer.enqueue({"session_id": "s", "request_id": "r1"})
+        writer.enqueue({"session_id": "s", "request_id": "r2"})
+        await writer.stop()
+
+        assert fake_session["batches"] == []
+        status = writer.status()
+        assert status["failing"] is True
+        assert status["dropped_rows"] == 2
+        assert "database down" in status["last_error"]
+        assert dropped_metric._value.get() - before == 2
+
+        # A later successful batch clears the failing flag but keeps the drop count
+        writer.enqueue({"session_id": "s", "request_id": "r3"})
+        await writer.stop()
+        assert writer.status()["failing"] is False
+        assert writer.dropped_rows == 2
+
+    @pytest.mark.asyncio
+    async def test_copy_serializes_json_columns(self, fake_copy):
+        writer = BatchWriter(InteractionBehaviorLog, use_copy=True)
+        writer.enqueue(self._behavior_row("s", 1))
+        await writer.stop()
+
+        fake_copy.assert_awaited_once()
+        kwargs = fake_copy.await_args.kwargs
+        assert fake_copy.await_args.args == ("interaction_behaviors",)
+        record = kwargs["records"][0]
+        metadata = record[kwargs["columns"].index("interaction_metadata")]
+        assert isinstance(metadata, str) and json.loads(metadata) == {"index": 1}
+
+    @pytest.mark.asyncio
+    async def test_sharded_copy_writes_every_row(self, fake_copy):
+        writer = BatchWriter(InteractionBehaviorLog, use_copy=True, copy_shards=4)
+        for i in range(20):
+            writer.enqueue(self._behavior_row(f"session_{i % 5}", i))
+        await writer.stop()
+
+        written = [record for call in fake_copy.await_args_list for record in call.kwargs["records"]]
+        assert len(written) == 20
+        assert writer.dropped_rows == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_copy_shard_does_not_drop_other_shards(self, fake_copy):
+        async def copy_records(table, records, columns):
+            if any(record[columns.index("session_id")] == "bad_session" for record in records):
+                raise ConnectionError("shard connection lost")
+
+        fake_copy.side_effect = copy_records
+        writer = BatchWriter(InteractionBehaviorLog, use_copy=True, copy_shards=4,
+                             max_attempts=2, retry_backoff_ms=1)
+        sessions = ["bad_session"] + [f"session_{i}" for i in range(7)]
+        for i in range(16):
+            writer.enqueue(self._behavior_row(sessions[i % len(sessions)], i))
+        await writer.stop()
+
+        written = [
+            record for call in fake_copy.await_args_list
+            if not any(r[call.kwargs["columns"].index("session_id")] == "bad_session"
+                       for r in call.kwargs["records"])
+            for record in call.kwargs["records"]
+        ]
+        assert writer.dropped_rows == 16 - len(written)
+        assert written and writer.dropped_rows >= 2
+        assert writer.status()["failing"] is True
+
+
 class TestPrometheusMetricsE2E:
     """End-to-end tests for Prometheus metrics integration."""
 
@@ -105,12 +105,15 @@ def print_interaction_analysis(response: Dict[str, Any], message: str):
     print(f"\n📊 Status Analysis:")
     if failure_injected:
         print(f"  🎭 Failure Injection: ✅ Applied ({failure_mode})")
-        status_emoji = "✅" if natural_status == "success" else "❌"
-        print(f"  🤖 Natural LLM Status: {status_emoji} {natural_status}")
+        if natural_status == "not_called":
+            print(f"  🤖 Natural LLM Status: ⏭️  not called (skipped for {failure_mode})")
+        else:
+            status_emoji = "✅" if natural_status == "success" else "❌"
+            print(f"  🤖 Natural LLM Status: {status_emoji} {natural_status}")
         status_emoji = "❌" if observed_status == "failure" else "✅"
         print(f"  👁️  Observed Status: {status_emoji} {observed_status}")
         
-        if natural_status != observed_status:
+        if natural_status not in (observed_status, "not_called"):
             print(f"  ⚠️  Status Changed: {natural_status} → {observed_status}")
     else:
         print(f"  🎭 Failure Injection: ❌ None")
@@ -286,6 +289,7 @@ def print_session_analysis(session_id: str):
     print(f"Total interactions recorded: {len(interactions)}")
     
     natural_successes = 0
+    llm_skipped = 0
     observed_failures = 0
     injections_applied = 0
     
@@ -315,12 +319,16 @@ def print_session_analysis(session_id: str):
             print(f"🔧 Failure Mode: {failure_mode}")
         print(f"⏱️  Processing Time: {processing_time}ms")
         
-        if failure_injected and natural_response != observed_response:
+        if natural_status == "not_called":
+            print(f"\n🤖 Natural Response: (LLM not called)")
+        elif failure_injected and natural_response != observed_response:
             print(f"\n🤖 Natural Response: \"{natural_response}\"")
             print(f"👁️  Observed Response: \"{observed_response}\"")
         
-        # Update statistics
-        if natural_status == "success":
+        # Update statistics; skipped LLM calls count toward neither success nor failure
+        if natural_status == "not_called":
+            llm_skipped += 1
+        elif natural_status == "success":
             natural_successes += 1
         if observed_status in ["failure", "error"]:
             observed_failures += 1
@@ -329,7 +337,11 @@ def print_session_analysis(session_id: str):
     
     # Print summary statistics
     print_subsection("📊 Session Statistics")
-    print(f"Natural LLM Success Rate: {natural_successes}/{len(interactions)} ({(natural_successes/len(interactions)*100):.1f}%)")
+    llm_called = len(interactions) - llm_skipped
+    if llm_called:
+        print(f"Natural LLM Success Rate: {natural_successes}/{llm_called} ({(natural_successes/llm_called*100):.1f}%)")
+    if llm_skipped:
+        print(f"LLM Calls Skipped (integration/resource failures): {llm_skipped}/{len(interactions)}")
     print(f"Observed Failure Rate: {observed_failures}/{len(interactions)} ({(observed_failures/len(interactions)*100):.1f}%)")
     print(f"Failure Injections Applied: {injections_applied}/{len(interactions)} ({(injections_applied/len(interactions)*100):.1f}%)")
     
@@ -0,0 +1,321 @@
+"""
+Round-trip tests for the Redis-backed agent state.
+
+Runs StateManager against fakeredis, so the pipelines, hashes and lists are
+exercised for real without a Redis server.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+import fakeredis
+
+from app import redis_client
+from app.redis_client import StateManager, COUNTER_FIELDS
+from app.agent_service import CustomerServiceAgent
+from app.models import AgentRequest, FailureMode, InteractionStatus
+
+
+def _turn(index: int):
+    """One user/assistant exchange as (messages, history_meta)."""
+    messages = [
+        {"role": "user", "content": f"question {index}"},
+        {"role": "assistant", "content": f"answer {index}"}
+    ]
+    meta = [
+        {"timestamp": index * 2, "failure_mode": None, "token_count": 3},
+        {"timestamp": index * 2 + 1, "failure_mode": None, "token_count": 5}
+    ]
+    return messages, meta
+
+
+@pytest.fixture
+def state_manager(monkeypatch):
+    """StateManager bound to an empty in-memory Redis."""
+    monkeypatch.setattr(redis_client, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(redis_client, "SAVE_DEBOUNCE_SECONDS", 0.001)
+    redis_client._pending_states.clear()
+    yield StateManager()
+    redis_client._pending_states.clear()
+
+
+class TestStateRoundTrip:
+    """save_state/append_state followed by load_state."""
+
+    @pytest.mark.asyncio
+    async def test_save_state_round_trip_with_history_limit(self, state_manager):
+        messages, meta = [], []
+        for i in range(3):
+            turn_messages, turn_meta = _turn(i)
+            messages += turn_messages
+            meta += turn_meta
+        state = {
+            "messages": messages,
+            "history_meta": meta,
+            "context": {"tier": "gold"},
+            "failure_count": 1,
+            "recovery_count": 0,
+            "token_count_total": 24
+        }
+        await state_manager.save_state("s1", state)
+
+        assert await state_manager.load_state("s1") == state
+
+        limited = await state_manager.load_state("s1", history_limit=2)
+        assert limited["messages"] == messages[-2:]
+        assert limited["history_meta"] == meta[-2:]
+        assert limited["context"] == {"tier": "gold"}
+        assert limited["token_count_total"] == 24
+
+    @pytest.mark.asyncio
+    async def test_append_state_extends_history(self, state_manager):
+        first_messages, first_meta = _turn(0)
+        await state_manager.save_state("s1", {
+            "messages": first_messages,
+            "history_meta": first_meta,
+            "context": {},
+            "failure_count": 0,
+            "recovery_count": 0,
+            "token_count_total": 8
+        })
+
+        second_messages, second_meta = _turn(1)
+        await state_manager.append_state(
+            "s1",
+            {"context": {"step": 2}, "token_count_total": 999},
+            {"messages": second_messages, "history_meta": second_meta},
+            increments={"token_count_total": 8}
+        )
+
+        state = await state_manager.load_state("s1")
+        assert state["messages"] == first_messages + second_messages
+        assert state["history_meta"] == first_meta + second_meta
+        assert state["context"] == {"step": 2}
+        # The counter is incremented, not overwritten with the stale total
+        assert state["token_count_total"] == 16
+
+        limited = await state_manager.load_state("s1", history_limit=1)
+        assert limited["messages"] == second_messages[-1:]
+        assert limited["history_meta"] == second_meta[-1:]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_appends_keep_both_counter_updates(self, state_manager):
+        await state_manager.save_state("s1", {
+            "messages": [], "history_meta": [], "context": {},
+            "failure_count": 0, "recovery_count": 0, "token_count_total": 10
+        })
+
+        # Two workers loaded the same state (total 10) and each adds its own turn
+        for i, tokens in enumerate((4, 6)):
+            messages, meta = _turn(i)
+            await state_manager.append_state(
+                "s1",
+                {"context": {}, "token_count_total": 10 + tokens, "failure_count": 1},
+                {"messages": messages, "history_meta": meta},
+                increments={"token_count_total": tokens, "failure_count": 1}
+            )
+
+        state = await state_manager.load_state("s1")
+        assert state["token_count_total"] == 20
+        assert state["failure_count"] == 2
+        assert len(state["messages"]) == 4
+
+    @pytest.mark.asyncio
+    async def test_append_to_new_session_starts_counters_at_zero(self, state_manager):
+        messages, meta = _turn(0)
+        await state_manager.append_state(
+            "new_session",
+            {"context": {}, "failure_count": 0, "recovery_count": 0, "token_count_total": 8},
+            {"messages": messages, "history_meta": meta},
+            increments={"token_count_total": 8, "latency_seconds": 0.25}
+        )
+
+        state = await state_manager.load_state("new_session")
+        assert state["token_count_total"] == 8
+        assert state["latency_seconds"] == 0.25
+        assert state["messages"] == messages
+
+    @pytest.mark.asyncio
+    async def test_unchanged_counters_round_trip_as_zero(self, state_manager):
+        messages, meta = _turn(0)
+        await state_manager.append_state(
+            "s1",
+            {"context": {}, "failure_count": 0, "recovery_count": 0, "token_count_total": 8},
+            {"messages": messages, "history_meta": meta},
+            increments={"token_count_total": 8}
+        )
+
+        state = await state_manager.load_state("s1")
+        assert {field: state[field] for field in COUNTER_FIELDS} == {
+            "token_count_total": 8, "failure_count": 0, "recovery_count": 0
+        }
+
+    @pytest.mark.asyncio
+    async def test_load_state_defaults_counters_missing_from_the_hash(self, state_manager):
+        await redis_client.redis_client.hset("agent_state:s1:meta", mapping={"context": "{}"})
+
+        state = await state_manager.load_state("s1")
+        assert all(state[field] == 0 for field in COUNTER_FIELDS)
+
+
+async def _drain_writes():
+    """Wait for every scheduled background write to finish."""
+    while redis_client._write_tasks:
+        await asyncio.gather(*redis_client._write_tasks.values(), return_exceptions=True)
+
+
+def _empty_state(token_count_total: int = 0):
+    return {
+        "messages": [], "history_meta": [], "context": {},
+        "failure_count": 0, "recovery_count": 0, "token_count_total": token_count_total
+    }
+
+
+class TestWriteBehind:
+    """schedule_append coalescing, retries and deletion."""
+
+    @staticmethod
+    def _schedule_turns(state_manager, session_id, count):
+        state = _empty_state()
+        for i in range(count):
+            messages, meta = _turn(i)
+            state = dict(state, messages=state["messages"] + messages,
+                         history_meta=state["history_meta"] + meta,
+                         token_count_total=state["token_count_total"] + 8)
+            state_manager.schedule_append(
+                session_id, state, {"messages": messages, "history_meta": meta},
+                increments={"token_count_total": 8}
+            )
+        return state
+
+    @pytest.mark.asyncio
+    async def test_rapid_appends_coalesce_into_one_write(self, state_manager, monkeypatch):
+        append_state = state_manager.append_state
+        calls = []
+
+        async def counting_append(*args, **kwargs):
+            calls.append(args)
+            await append_state(*args, **kwargs)
+
+        monkeypatch.setattr(state_manager, "append_state", counting_append)
+        final_state = self._schedule_turns(state_manager, "s1", 3)
+
+        # Pending state is served before the write lands
+        assert await state_manager.load_state("s1") is final_state
+
+        await _drain_writes()
+        assert len(calls) == 1
+        assert "s1" not in redis_client._pending_states
+        stored = await state_manager.load_state("s1")
+        assert stored["messages"] == final_state["messages"]
+        assert stored["history_meta"] == final_state["history_meta"]
+        assert stored["token_count_total"] == 24
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_requeued_and_retried(self, state_manager, monkeypatch):
+        append_state = state_manager.append_state
+        failures = [ConnectionError("redis unavailable")]
+
+        async def flaky_append(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            await append_state(*args, **kwargs)
+
+        monkeypatch.setattr(state_manager, "append_state", flaky_append)
+        final_state = self._schedule_turns(state_manager, "s1", 2)
+
+        await _drain_writes()
+        stored = await state_manager.load_state("s1")
+        assert stored["messages"] == final_state["messages"]
+        assert stored["token_count_total"] == 16
+
+    @pytest.mark.asyncio
+    async def test_write_gives_up_after_max_attempts(self, state_manager, monkeypatch):
+        calls = []
+
+        async def failing_append(*args, **kwargs):
+            calls.append(args)
+            raise ConnectionError("redis unavailable")
+
+        monkeypatch.setattr(state_manager, "append_state", failing_append)
+        self._schedule_turns(state_manager, "s1", 1)
+
+        await _drain_writes()
+        assert len(calls) == redis_client.SAVE_MAX_ATTEMPTS
+        assert "s1" not in redis_client._pending_states
+
+    @pytest.mark.asyncio
+    async def test_delete_before_write_cancels_it(self, state_manager):
+        self._schedule_turns(state_manager, "s1", 1)
+        await state_manager.delete_state("s1")
+
+        await _drain_writes()
+        assert await state_manager.load_state("s1") is None
+        assert await redis_client.redis_client.keys("agent_state:s1:*") == []
+
+    @pytest.mark.asyncio
+    async def test_delete_waits_for_in_flight_write(self, state_manager, monkeypatch):
+        append_state = state_manager.append_state
+        write_started = asyncio.Event()
+        release_write = asyncio.Event()
+
+        async def slow_append(*args, **kwargs):
+            write_started.set()
+            await release_write.wait()
+            await append_state(*args, **kwargs)
+
+        monkeypatch.setattr(state_manager, "append_state", slow_append)
+        self._schedule_turns(state_manager, "s1", 1)
+        await write_started.wait()
+
+        delete = asyncio.create_task(state_manager.delete_state("s1"))
+        await asyncio.sleep(0)
+        release_write.set()
+        await delete
+
+        await _drain_writes()
+        assert await state_manager.load_state("s1") is None
+        assert await redis_client.redis_client.keys("agent_state:s1:*") == []
+
+
+class TestAgentStatePersistence:
+    """Agent turns persisted through the write-behind and loaded back."""
+
+    @pytest.fixture
+    def agent(self, state_manager):
+        completion = Mock()
+        completion.choices = [Mock()]
+        completion.choices[0].message.content = "Your order ships tomorrow."
+        completion.usage = Mock(prompt_tokens=20, completion_tokens=10)
+
+        with patch.dict('os.environ', {'BEHAVIORAL_TRACKING_ENABLED': 'false'}):
+            agent = CustomerServiceAgent()
+        agent.openai_client = AsyncMock()
+        agent.openai_client.chat.completions.create = AsyncMock(return_value=completion)
+        agent.state_manager = state_manager
+        return agent
+
+    @pytest.mark.asyncio
+    async def test_failure_injected_turns_after_state_reload(self, agent):
+        db_session = AsyncMock()
+        request = AgentRequest(
+            session_id="persisted_session",
+            message="Where is my order?",
+            failure_mode=FailureMode.HALLUCINATION,
+            model="gpt-3.5-turbo"
+        )
+
+        with patch('app.agent_service.interaction_writer'):
+            for turn in range(2):
+                response = await agent.process_request(request, db_session)
+                assert response.status == InteractionStatus.FAILURE, response.response
+                assert response.failure_injection_applied
+                # Let the write-behind land so the next turn loads from Redis
+                await _drain_writes()
+                assert "persisted_session" not in redis_client._pending_states
+
+        state = await agent.state_manager.load_state("persisted_session")
+        assert state["failure_count"] == 2
+        assert state["recovery_count"] == 0
+        assert len(state["messages"]) == 4